@@ -1,24 +1,20 @@
 # binance/binance_pairs.py
 # Ambil dan filter pair USDT perpetual futures berdasarkan volume.
 
-from typing import List, Dict
-import requests
+from typing import List
 import pandas as pd
 
-from config import BINANCE_REST_URL
+from binance.binance_rest import rest_get
 
 
 def get_usdt_pairs(max_pairs: int, min_volume_usdt: float) -> List[str]:
     """
     Ambil semua pair USDT PERPETUAL yang statusnya TRADING,
     lalu filter hanya yang 24h quote volume >= min_volume_usdt USDT.
-    Return: list symbol lower-case (ethusdt, btcusdt, ...)
+    Return: list symbol upper-case apa adanya dari Binance (ETHUSDT, BTCUSDT, ...)
     """
     # 1) Ambil info exchange untuk filter symbol yang valid
-    info_url = f"{BINANCE_REST_URL}/fapi/v1/exchangeInfo"
-    r = requests.get(info_url, timeout=10)
-    r.raise_for_status()
-    info = r.json()
+    info = rest_get("/fapi/v1/exchangeInfo")
 
     usdt_symbols: List[str] = []
     for s in info.get("symbols", []):
@@ -34,10 +30,7 @@ def get_usdt_pairs(max_pairs: int, min_volume_usdt: float) -> List[str]:
         return []
 
     # 2) Ambil data ticker 24h untuk semua symbol
-    ticker_url = f"{BINANCE_REST_URL}/fapi/v1/ticker/24hr"
-    r2 = requests.get(ticker_url, timeout=10)
-    r2.raise_for_status()
-    tickers = r2.json()
+    tickers = rest_get("/fapi/v1/ticker/24hr")
 
     # 3) Pakai Pandas untuk memproses volume
     df = pd.DataFrame(tickers)
@@ -61,12 +54,12 @@ def get_usdt_pairs(max_pairs: int, min_volume_usdt: float) -> List[str]:
     # Urutkan desc berdasarkan volume
     df = df.sort_values("quoteVolume", ascending=False)
 
-    # Ambil list symbol lower-case
-    symbols_lower: List[str] = df["symbol"].str.lower().tolist()
+    # Ambil list symbol (upper-case, sama seperti field "s" di WebSocket)
+    symbols: List[str] = df["symbol"].tolist()
 
     # Batasi jumlah pair jika max_pairs > 0
     if max_pairs > 0:
-        symbols_lower = symbols_lower[:max_pairs]
+        symbols = symbols[:max_pairs]
 
-    print(f"Filter volume >= {min_vol:,.0f} USDT → {len(symbols_lower)} pair.")
-    return symbols_lower
+    print(f"Filter volume >= {min_vol:,.0f} USDT → {len(symbols)} pair.")
+    return symbols
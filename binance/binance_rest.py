@@ -0,0 +1,42 @@
+# binance/binance_rest.py
+# Client REST Binance Futures bersama: satu Session (keep-alive + connection pool)
+# dipakai semua modul (preload 5m, HTF context, daftar pair).
+
+from typing import List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    # orjson decode body klines/ticker beberapa kali lebih cepat dari json stdlib
+    import orjson
+
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = None
+
+from config import BINANCE_REST_URL
+
+
+_SESSION = requests.Session()
+_SESSION.mount("https://", HTTPAdapter(pool_connections=32, pool_maxsize=64))
+
+
+def rest_get(path: str, params: Optional[dict] = None, timeout: float = 10):
+    """
+    GET ke REST futures (path contoh: "/fapi/v1/klines"), return JSON.
+    Raise requests.HTTPError kalau status bukan 2xx.
+    """
+    r = _SESSION.get(f"{BINANCE_REST_URL}{path}", params=params, timeout=timeout)
+    r.raise_for_status()
+    if _json_loads is not None:
+        return _json_loads(r.content)
+    return r.json()
+
+
+def fetch_klines(symbol: str, interval: str, limit: int) -> List[list]:
+    """
+    Ambil klines raw Binance. `symbol` upper-case (BTCUSDT).
+    """
+    params = {"symbol": symbol, "interval": interval, "limit": limit}
+    return rest_get("/fapi/v1/klines", params)
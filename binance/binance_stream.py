@@ -3,15 +3,27 @@
 
 import asyncio
 import json
+import logging
 import time
-from typing import List
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
 
-import requests
 import websockets
 
-from config import BINANCE_STREAM_URL, BINANCE_REST_URL, REFRESH_PAIR_INTERVAL_HOURS
+try:
+    # orjson jauh lebih cepat untuk frame JSON kecil dari WebSocket
+    import orjson
+
+    _json_loads = orjson.loads
+    _JSONDecodeError = orjson.JSONDecodeError
+except ImportError:
+    _json_loads = json.loads
+    _JSONDecodeError = json.JSONDecodeError
+
+from config import BINANCE_STREAM_URL, REFRESH_PAIR_INTERVAL_HOURS
 from binance.binance_pairs import get_usdt_pairs
-from binance.ohlc_buffer import OHLCBufferManager
+from binance.binance_rest import fetch_klines
+from binance.ohlc_buffer import CandleArrays, OHLCBufferManager
 from core.bot_state import (
     state,
     load_subscribers,
@@ -19,60 +31,119 @@ from core.bot_state import (
     cleanup_expired_vip,
     load_bot_state,
 )
-from imb.imb_detector import analyze_symbol_imb
+from core.imb_settings import imb_settings
+from imb.htf_context import HTF_WARM_AHEAD, HTF_WARM_INTERVAL, warm_htf_contexts
+from imb.imb_detector import analyze_symbols_batch
 from telegram.telegram_broadcast import broadcast_signal
 
+log = logging.getLogger("imb")
 
 MAX_5M_CANDLES = 120
 PRELOAD_LIMIT_5M = 60
 
+# Penanda payload kline di frame combined stream: {"stream":...,"data":{...,"k":{...}}}
+_KLINE_MARKER = '"k":'
+_KLINE_MARKER_B = b'"k":'
+
+# Jeda (detik) untuk mengumpulkan frame close satu boundary 5m sebelum dianalisa
+# sekaligus; Binance mengirim close semua symbol dalam rentang ratusan ms.
+CLOSE_BATCH_WINDOW = 0.3
+
+# Warm HTF background jalan di tengah candle 5m (detik setelah boundary),
+# jauh dari burst frame close + analisa batch.
+HTF_WARM_OFFSET = 150
+
 # Batas preload REST /klines paralel (boleh dibesarkan kalau koneksi kuat)
 MAX_PRELOAD_CONCURRENCY = 20
 
+# Executor khusus preload: default executor asyncio hanya punya min(32, CPU+4)
+# thread dan juga dipakai analyzer, jadi request preload bisa antri di sana.
+_preload_executor = ThreadPoolExecutor(
+    max_workers=MAX_PRELOAD_CONCURRENCY,
+    thread_name_prefix="preload",
+)
+
 
-def _fetch_klines(symbol: str, interval: str, limit: int) -> List[list]:
-    url = f"{BINANCE_REST_URL}/fapi/v1/klines"
-    params = {"symbol": symbol.upper(), "interval": interval, "limit": limit}
-    r = requests.get(url, params=params, timeout=10)
-    r.raise_for_status()
-    return r.json()
+async def _deadline_watcher(deadline: float, refresh_event: asyncio.Event):
+    """
+    Tidur sampai deadline refresh pair, lalu set refresh_event.
+    """
+    await asyncio.sleep(max(0.0, deadline - time.time()))
+    refresh_event.set()
 
 
-async def _analyze_and_broadcast(symbol: str, candles, now_ts: float):
+async def _htf_warm_loop(get_symbols: Callable[[], List[str]]):
     """
-    Worker untuk:
-    - analisa IMB (sync, dijalankan di thread via asyncio.to_thread)
-    - jika ada sinyal: kirim Telegram (juga di thread)
-    - update cooldown dan log.
+    Refresh cache HTF semua pair di background, sekali per siklus candle 5m
+    (HTF_WARM_INTERVAL), di tengah candle. Entry yang akan expired sebelum
+    putaran berikutnya di-refresh duluan, jadi analyzer di boundary close
+    tidak pernah menunggu REST HTF.
+    """
+    while True:
+        now = time.time()
+        await asyncio.sleep(
+            HTF_WARM_INTERVAL - (now - HTF_WARM_OFFSET) % HTF_WARM_INTERVAL
+        )
+        symbols = get_symbols()
+        # STANDBY: tidak ada analisa → jangan habiskan weight API untuk HTF
+        if not imb_settings.use_htf_filter or not state.scanning or not symbols:
+            continue
+        try:
+            await asyncio.to_thread(warm_htf_contexts, symbols, HTF_WARM_AHEAD)
+        except Exception as e:
+            log.error("ERROR warm cache HTF: %s", e)
 
-    TIDAK dibatasi concurrency di level fungsi ini.
+
+async def _signal_sender(signal_queue: asyncio.Queue):
     """
-    try:
-        # analisa IMB di thread terpisah
-        result = await asyncio.to_thread(analyze_symbol_imb, symbol, candles)
-    except Exception as e:
-        print(f"[{symbol}] ERROR analyze_symbol_imb:", e)
-        return
+    Satu-satunya pengirim sinyal ke Telegram.
+    Broadcast jalan berurutan di thread terpisah, jadi:
+    - loop WebSocket tidak pernah menunggu HTTP Telegram
+    - beberapa sinyal yang keluar bersamaan tidak saling rebutan daily_counts
+    """
+    while True:
+        symbol, result = await signal_queue.get()
+        try:
+            await asyncio.to_thread(broadcast_signal, result["message"])
+            log.info(
+                "[%s] IMB SINYAL TERKIRIM — Tier %s (Score %s) Entry %.6f SL %.6f",
+                symbol, result["tier"], result["score"], result["entry"], result["sl"],
+            )
+        except Exception as e:
+            log.error("[%s] ERROR broadcast_signal: %s", symbol, e)
+        finally:
+            signal_queue.task_done()
 
-    if not result:
-        return
 
-    text = result["message"]
+async def _analyze_close_batch(
+    open_time: int,
+    close_batches: Dict[int, Dict[str, Tuple[CandleArrays, float]]],
+    signal_queue: asyncio.Queue,
+):
+    """
+    Worker untuk satu boundary candle 5m:
+    - tunggu CLOSE_BATCH_WINDOW supaya frame close symbol lain ikut terkumpul
+    - analisa IMB semua symbol sekaligus (analyze_symbols_batch, di thread)
+    - sinyal yang lolos masuk antrian _signal_sender + update cooldown.
+    """
+    await asyncio.sleep(CLOSE_BATCH_WINDOW)
+    batch = close_batches.pop(open_time, None)
+    if not batch:
+        return
 
+    items = [(symbol, candles) for symbol, (candles, _) in batch.items()]
+    avg_bodies = [avg_body for _, avg_body in batch.values()]
     try:
-        # kirim Telegram di thread terpisah
-        await asyncio.to_thread(broadcast_signal, text)
+        results = await asyncio.to_thread(analyze_symbols_batch, items, avg_bodies)
     except Exception as e:
-        print(f"[{symbol}] ERROR broadcast_signal:", e)
-
-    # update cooldown timestamp
-    state.last_signal_time[symbol] = now_ts
+        log.error("ERROR analyze_symbols_batch (%d symbol): %s", len(items), e)
+        return
 
-    print(
-        f"[{symbol}] IMB SINYAL TERKIRIM — "
-        f"Tier {result['tier']} (Score {result['score']}) "
-        f"Entry {result['entry']:.6f} SL {result['sl']:.6f}"
-    )
+    # update cooldown timestamp (langsung, supaya close berikutnya tidak dobel sinyal)
+    now_ts = time.time()
+    for symbol, result in results:
+        state.last_signal_time[symbol] = now_ts
+        signal_queue.put_nowait((symbol, result))
 
 
 async def run_imb_bot():
@@ -83,122 +154,163 @@ async def run_imb_bot():
     cleanup_expired_vip()
     load_bot_state()
 
-    print(f"Loaded {len(state.subscribers)} subscribers, {len(state.vip_users)} VIP users.")
+    log.info("Loaded %d subscribers, %d VIP users.", len(state.subscribers), len(state.vip_users))
 
     symbols: List[str] = []
+    ws_url = ""
     last_pairs_refresh: float = 0.0
     refresh_interval = REFRESH_PAIR_INTERVAL_HOURS * 3600
 
+    # di-set oleh _deadline_watcher saat interval refresh pair tercapai,
+    # supaya loop WS tidak perlu cek jam di setiap frame
+    refresh_event = asyncio.Event()
+    refresh_watcher: Optional[asyncio.Task] = None
+
     ohlc_mgr = OHLCBufferManager(max_candles=MAX_5M_CANDLES)
 
+    signal_queue: asyncio.Queue = asyncio.Queue()
+    sender_task = asyncio.create_task(_signal_sender(signal_queue))
+    # `symbols` dibaca ulang tiap putaran → ikut daftar pair terbaru
+    htf_warm_task = asyncio.create_task(_htf_warm_loop(lambda: symbols))
+
+    # candle close yang menunggu dianalisa, per open_time candle:
+    # {open_time: {symbol: (snapshot array, avg_body)}}
+    close_batches: Dict[int, Dict[str, Tuple[CandleArrays, float]]] = {}
+
+    # open_time candle close terakhir yang sudah masuk analisa, per symbol.
+    # Frame close yang sama bisa datang lagi (mis. setelah reconnect) → tidak dianalisa ulang.
+    last_analyzed: Dict[str, int] = {}
+
     while state.running:
         try:
             now = time.time()
             need_refresh_pairs = (
                 not symbols
-                or (now - last_pairs_refresh) > refresh_interval
+                or refresh_event.is_set()
                 or state.force_pairs_refresh
             )
 
             if need_refresh_pairs:
-                print("Refresh daftar pair USDT perpetual berdasarkan volume...")
+                log.info("Refresh daftar pair USDT perpetual berdasarkan volume...")
                 symbols = get_usdt_pairs(state.max_pairs, state.min_volume_usdt)
                 last_pairs_refresh = now
+
+                if refresh_watcher is not None:
+                    refresh_watcher.cancel()
+                refresh_event = asyncio.Event()
+                refresh_watcher = asyncio.create_task(
+                    _deadline_watcher(last_pairs_refresh + refresh_interval, refresh_event)
+                )
                 state.force_pairs_refresh = False
-                print(f"Scan {len(symbols)} pair:", ", ".join(s.upper() for s in symbols))
+                log.info("Scan %d pair: %s", len(symbols), ", ".join(symbols))
 
                 # ============================
                 # PRELOAD HISTORY 5M (PARALEL)
                 # ============================
-                print(
-                    f"Mulai preload history 5m untuk {len(symbols)} symbol "
-                    f"(limit={PRELOAD_LIMIT_5M}, concurrency={MAX_PRELOAD_CONCURRENCY})..."
+                log.info(
+                    "Mulai preload history 5m untuk %d symbol (limit=%d, concurrency=%d)...",
+                    len(symbols), PRELOAD_LIMIT_5M, MAX_PRELOAD_CONCURRENCY,
                 )
 
-                sem_preload = asyncio.Semaphore(MAX_PRELOAD_CONCURRENCY)
+                loop = asyncio.get_running_loop()
 
                 async def _preload_one(sym: str):
-                    # sym: lowercase symbol (sesuai dengan yang dipakai WS & OHLCBufferManager)
-                    async with sem_preload:
-                        try:
-                            # _fetch_klines akan .upper() sendiri di dalam
-                            kl = await asyncio.to_thread(
-                                _fetch_klines, sym, "5m", PRELOAD_LIMIT_5M
-                            )
-                            if not kl:
-                                print(f"[PRELOAD] {sym} — klines kosong")
-                                return
-                            ohlc_mgr.preload_candles(sym, kl)
-                        except Exception as e:
-                            print(f"[PRELOAD ERROR] {sym}: {e}")
+                    # sym: symbol upper-case (sama dengan field "s" WS & key OHLCBufferManager)
+                    try:
+                        kl = await loop.run_in_executor(
+                            _preload_executor, fetch_klines, sym, "5m", PRELOAD_LIMIT_5M
+                        )
+                        if not kl:
+                            log.warning("[PRELOAD] %s — klines kosong", sym)
+                            return
+                        ohlc_mgr.preload_candles(sym, kl)
+                    except Exception as e:
+                        log.error("[PRELOAD ERROR] %s: %s", sym, e)
 
                 await asyncio.gather(*(_preload_one(sym) for sym in symbols))
 
-                print("Preload selesai.")
+                log.info("Preload selesai.")
+
+                # isi cache HTF semua pair sekarang, bukan saat sinyal pertama tiap symbol
+                # (selanjutnya dijaga tetap hangat oleh _htf_warm_loop)
+                if imb_settings.use_htf_filter:
+                    await asyncio.to_thread(warm_htf_contexts, symbols)
+                    log.info("Warm cache HTF selesai.")
+
+                # URL stream cukup dibangun sekali per refresh pair, bukan tiap reconnect
+                # (nama stream Binance wajib lower-case)
+                streams = "/".join(f"{s.lower()}@kline_5m" for s in symbols)
+                ws_url = f"{BINANCE_STREAM_URL}?streams={streams}"
 
             if not symbols:
-                print("Tidak ada symbol untuk discan. Tidur sebentar...")
+                log.warning("Tidak ada symbol untuk discan. Tidur sebentar...")
                 await asyncio.sleep(5)
                 continue
 
-            streams = "/".join(f"{s}@kline_5m" for s in symbols)
-            ws_url = f"{BINANCE_STREAM_URL}?streams={streams}"
-
-            print(f"Menghubungkan ke WebSocket: {ws_url}")
+            log.info("Menghubungkan ke WebSocket: %s", ws_url)
             async with websockets.connect(ws_url, ping_interval=20, ping_timeout=20) as ws:
-                print("WebSocket terhubung.")
+                log.info("WebSocket terhubung.")
                 if state.scanning:
-                    print("Scan sebelumnya AKTIF → melanjutkan scan otomatis.")
+                    log.info("Scan sebelumnya AKTIF → melanjutkan scan otomatis.")
                 else:
-                    print("Bot dalam mode STANDBY. Gunakan /startscan untuk mulai scan.\n")
+                    log.info("Bot dalam mode STANDBY. Gunakan /startscan untuk mulai scan.")
 
                 while state.running:
                     if state.request_soft_restart:
-                        print("Soft restart diminta → putus WS & refresh engine...")
+                        log.info("Soft restart diminta → putus WS & refresh engine...")
                         state.request_soft_restart = False
                         break
 
-                    if time.time() - last_pairs_refresh > refresh_interval:
-                        print("Interval refresh pair tercapai → refresh daftar pair & reconnect WebSocket...")
+                    if refresh_event.is_set():
+                        log.info("Interval refresh pair tercapai → refresh daftar pair & reconnect WebSocket...")
                         break
 
                     try:
                         msg = await asyncio.wait_for(ws.recv(), timeout=60)
                     except asyncio.TimeoutError:
-                        if state.debug:
-                            print("Timeout menunggu data WebSocket, lanjut...")
+                        log.debug("Timeout menunggu data WebSocket, lanjut...")
+                        continue
+
+                    # frame tanpa payload kline (ack subscribe, dsb) dibuang sebelum parse JSON
+                    if (_KLINE_MARKER_B if isinstance(msg, bytes) else _KLINE_MARKER) not in msg:
                         continue
 
                     try:
-                        data = json.loads(msg)
-                    except json.JSONDecodeError:
-                        if state.debug:
-                            print("Gagal decode JSON dari WebSocket.")
+                        data = _json_loads(msg)
+                    except _JSONDecodeError:
+                        log.debug("Gagal decode JSON dari WebSocket.")
                         continue
 
-                    kline = data.get("data", {}).get("k")
-                    if not kline:
+                    # format combined stream stabil: {"stream":..., "data":{"s":..., "k":{...}}}
+                    try:
+                        payload = data["data"]
+                        kline = payload["k"]
+                        symbol = payload["s"]
+                        candle_closed = kline["x"]
+                    except (KeyError, TypeError, AttributeError):
                         continue
 
-                    symbol = data.get("data", {}).get("s", "").lower()
-                    if not symbol:
+                    # STANDBY: update candle yang belum close tidak perlu ditulis ke buffer.
+                    # Frame close tetap ditulis (menimpa candle yang sama), jadi buffer
+                    # tetap lengkap saat scan dilanjutkan.
+                    if not candle_closed and not state.scanning:
                         continue
 
                     # update buffer
                     ohlc_mgr.update_from_kline(symbol, kline)
-                    candle_closed = bool(kline.get("x", False))
-
-                    if state.debug and candle_closed:
-                        buf_len = len(ohlc_mgr.get_candles(symbol))
-                        print(f"[{time.strftime('%H:%M:%S')}] 5m close: {symbol} — total candle: {buf_len}")
 
                     if not candle_closed:
                         continue
+
+                    log.debug("5m close: %s — total candle: %d", symbol, ohlc_mgr.count(symbol))
                     if not state.scanning:
                         continue
 
-                    candles = ohlc_mgr.get_candles(symbol)
-                    if len(candles) < 40:
+                    if ohlc_mgr.count(symbol) < 40:
+                        continue
+
+                    open_time = kline["t"]
+                    if last_analyzed.get(symbol) == open_time:
                         continue
 
                     now_ts = time.time()
@@ -206,25 +318,35 @@ async def run_imb_bot():
                     if state.cooldown_seconds > 0:
                         last_ts = state.last_signal_time.get(symbol)
                         if last_ts and now_ts - last_ts < state.cooldown_seconds:
-                            if state.debug:
-                                print(
-                                    f"[{symbol}] Skip cooldown "
-                                    f"({int(now_ts - last_ts)}s/{state.cooldown_seconds}s)"
-                                )
+                            log.debug(
+                                "[%s] Skip cooldown (%ds/%ds)",
+                                symbol, now_ts - last_ts, state.cooldown_seconds,
+                            )
                             continue
 
                     # === PENTING: analisa & kirim sinyal DIJALANKAN DI TASK TERPISAH ===
                     # supaya loop WebSocket tidak pernah ke-block oleh kerja berat.
-                    asyncio.create_task(
-                        _analyze_and_broadcast(symbol, list(candles), now_ts)
-                    )
+                    # Semua symbol yang close di boundary yang sama dianalisa dalam satu batch.
+                    last_analyzed[symbol] = open_time
+                    batch = close_batches.get(open_time)
+                    if batch is None:
+                        batch = close_batches[open_time] = {}
+                        asyncio.create_task(
+                            _analyze_close_batch(open_time, close_batches, signal_queue)
+                        )
+                    # snapshot array (copy) supaya thread analyzer tidak membaca buffer yang sedang di-update
+                    batch[symbol] = (ohlc_mgr.get_arrays(symbol), ohlc_mgr.avg_body(symbol))
 
         except websockets.ConnectionClosed:
-            print("WebSocket terputus. Reconnect dalam 5 detik...")
+            log.warning("WebSocket terputus. Reconnect dalam 5 detik...")
             await asyncio.sleep(5)
         except Exception as e:
-            print("Error di run_imb_bot (luar):", e)
-            print("Coba reconnect dalam 5 detik...")
+            log.error("Error di run_imb_bot (luar): %s", e)
+            log.info("Coba reconnect dalam 5 detik...")
             await asyncio.sleep(5)
 
-    print("run_imb_bot selesai karena state.running = False")
+    sender_task.cancel()
+    htf_warm_task.cancel()
+    if refresh_watcher is not None:
+        refresh_watcher.cancel()
+    log.info("run_imb_bot selesai karena state.running = False")
@@ -1,30 +1,110 @@
 # binance/ohlc_buffer.py
 # Buffer OHLC 5m per symbol dari WebSocket futures.
+# Disimpan sebagai kolom NumPy (SoA) supaya analyzer bisa langsung pakai array
+# tanpa membangun ulang list dict candle setiap close.
 
-from collections import deque
-from typing import Deque, Dict, List, TypedDict
+from typing import Dict, NamedTuple
 
+import numpy as np
 
-class Candle(TypedDict):
-    open_time: int
-    close_time: int
-    open: float
-    high: float
-    low: float
-    close: float
-    volume: float
-    closed: bool
+
+class CandleArrays(NamedTuple):
+    """
+    Snapshot OHLC satu symbol (urut lama → baru), satu array per kolom.
+    """
+    open_time: np.ndarray
+    open: np.ndarray
+    high: np.ndarray
+    low: np.ndarray
+    close: np.ndarray
+    volume: np.ndarray
+
+
+# Urutan baris di array buffer
+_OPEN_TIME, _CLOSE_TIME, _OPEN, _HIGH, _LOW, _CLOSE, _VOLUME, _CLOSED = range(8)
+_N_FIELDS = 8
+
+# Jumlah candle terakhir untuk rata-rata body |close-open| (= lookback detektor IMB)
+BODY_AVG_WINDOW = 30
+
+
+class _SymbolBuffer:
+    """
+    Buffer satu symbol: array (_N_FIELDS, 2 * cap), data valid di kolom [start, end).
+    Kalau `end` mentok di ujung array, window digeser sekali ke depan
+    (amortized O(1) per candle), jadi data selalu contiguous dan bisa
+    di-slice tanpa np.roll.
+    `body_sum` = jumlah body `body_win` candle terakhir, di-update tiap
+    append / replace (dihitung ulang penuh saat geser supaya error float tidak menumpuk).
+    """
+
+    __slots__ = ("cap", "data", "start", "end", "body_win", "body_sum")
+
+    def __init__(self, cap: int) -> None:
+        self.cap = cap
+        self.data = np.zeros((_N_FIELDS, 2 * cap), dtype=np.float64)
+        self.start = 0
+        self.end = 0
+        self.body_win = min(BODY_AVG_WINDOW, cap)
+        self.body_sum = 0.0
+
+    def __len__(self) -> int:
+        return self.end - self.start
+
+    def clear(self) -> None:
+        self.start = 0
+        self.end = 0
+        self.body_sum = 0.0
+
+    def _body(self, col: int) -> float:
+        return abs(float(self.data[_CLOSE, col]) - float(self.data[_OPEN, col]))
+
+    def avg_body(self) -> float:
+        n = min(self.end - self.start, self.body_win)
+        return self.body_sum / n if n else 0.0
+
+    def last_open_time(self) -> float:
+        return self.data[_OPEN_TIME, self.end - 1]
+
+    def append(self, row: tuple) -> None:
+        if self.end == self.data.shape[1]:
+            n = self.end - self.start
+            self.data[:, :n] = self.data[:, self.start:self.end]
+            self.start = 0
+            self.end = n
+            lo = max(0, n - self.body_win)
+            self.body_sum = float(np.abs(self.data[_CLOSE, lo:n] - self.data[_OPEN, lo:n]).sum())
+
+        self.data[:, self.end] = row
+        self.end += 1
+        self.body_sum += abs(row[_CLOSE] - row[_OPEN])
+
+        n = self.end - self.start
+        if n > self.body_win:
+            # candle yang keluar dari window rata-rata body
+            self.body_sum -= self._body(self.end - 1 - self.body_win)
+        if n > self.cap:
+            self.start += 1
+
+    def replace_last(self, row: tuple) -> None:
+        self.body_sum += abs(row[_CLOSE] - row[_OPEN]) - self._body(self.end - 1)
+        self.data[:, self.end - 1] = row
+
+    def window(self) -> np.ndarray:
+        return self.data[:, self.start:self.end]
 
 
 class OHLCBufferManager:
     def __init__(self, max_candles: int = 300) -> None:
         self.max_candles = max_candles
-        self._buffers: Dict[str, Deque[Candle]] = {}
+        self._buffers: Dict[str, _SymbolBuffer] = {}
 
-    def _get_buffer(self, symbol: str) -> Deque[Candle]:
-        if symbol not in self._buffers:
-            self._buffers[symbol] = deque(maxlen=self.max_candles)
-        return self._buffers[symbol]
+    def _get_buffer(self, symbol: str) -> _SymbolBuffer:
+        buf = self._buffers.get(symbol)
+        if buf is None:
+            buf = _SymbolBuffer(self.max_candles)
+            self._buffers[symbol] = buf
+        return buf
 
     def update_from_kline(self, symbol: str, kline: dict) -> None:
         buf = self._get_buffer(symbol)
@@ -42,29 +122,38 @@ class OHLCBufferManager:
 
         closed = bool(kline.get("x", False))
 
-        candle: Candle = {
-            "open_time": open_time,
-            "close_time": close_time,
-            "open": o,
-            "high": h,
-            "low": l,
-            "close": c,
-            "volume": v,
-            "closed": closed,
-        }
-
-        if not buf:
-            buf.append(candle)
-            return
+        row = (open_time, close_time, o, h, l, c, v, closed)
 
-        last = buf[-1]
-        if last["open_time"] == open_time:
-            buf[-1] = candle
+        if len(buf) and buf.last_open_time() == open_time:
+            buf.replace_last(row)
         else:
-            buf.append(candle)
+            buf.append(row)
 
-    def get_candles(self, symbol: str) -> List[Candle]:
-        return list(self._get_buffer(symbol))
+    def count(self, symbol: str) -> int:
+        buf = self._buffers.get(symbol)
+        return len(buf) if buf is not None else 0
+
+    def avg_body(self, symbol: str) -> float:
+        """
+        Rata-rata body |close-open| BODY_AVG_WINDOW candle terakhir, O(1).
+        """
+        buf = self._buffers.get(symbol)
+        return buf.avg_body() if buf is not None else 0.0
+
+    def get_arrays(self, symbol: str) -> CandleArrays:
+        """
+        Salinan kolom OHLC (satu alokasi), aman dipakai di thread lain
+        sementara buffer terus di-update WebSocket.
+        """
+        w = self._get_buffer(symbol).window().copy()
+        return CandleArrays(
+            open_time=w[_OPEN_TIME],
+            open=w[_OPEN],
+            high=w[_HIGH],
+            low=w[_LOW],
+            close=w[_CLOSE],
+            volume=w[_VOLUME],
+        )
 
     def preload_candles(self, symbol: str, klines: list[list]) -> None:
         """
@@ -81,14 +170,4 @@ class OHLCBufferManager:
                 v = float(row[5])
             except (ValueError, IndexError):
                 continue
-            candle: Candle = {
-                "open_time": int(row[0]),
-                "close_time": int(row[6]),
-                "open": o,
-                "high": h,
-                "low": l,
-                "close": c,
-                "volume": v,
-                "closed": True,
-            }
-            buf.append(candle)
+            buf.append((int(row[0]), int(row[6]), o, h, l, c, v, True))
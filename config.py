@@ -41,5 +41,18 @@ IMB_MAX_ENTRY_AGE_CANDLES = int(os.getenv("IMB_MAX_ENTRY_AGE_CANDLES", "8"))
 # Minimal RR ke TP2 (misal 1.8 berarti TP2 minimal 1:1.8)
 IMB_MIN_RR_TP2 = float(os.getenv("IMB_MIN_RR_TP2", "1.8"))
 
+# Impuls: body minimal = faktor × rata-rata body 30 candle terakhir
+IMB_IMPULSE_FACTOR = float(os.getenv("IMB_IMPULSE_FACTOR", "1.8"))
+
+# SL% maksimal yang masih dikirim
+IMB_MAX_SL_PCT = float(os.getenv("IMB_MAX_SL_PCT", "1.5"))
+
+# Hard filter RR ke TP2 di detektor semi-strict (sinyal dengan RR TP2 di bawah ini dibuang).
+# (IMB_MIN_RR_TP2 di atas tidak dipakai detektor semi-strict; cut ini yang berlaku.)
+IMB_MIN_RR_TP2_CUT = float(os.getenv("IMB_MIN_RR_TP2_CUT", "1.6"))
+
+# Jarak entry maksimal dari harga sekarang (%)
+IMB_MAX_ENTRY_DISTANCE_PCT = float(os.getenv("IMB_MAX_ENTRY_DISTANCE_PCT", "0.80"))
+
 # Strict mode IMB
 IMB_STRICT_MODE = os.getenv("IMB_STRICT_MODE", "false").lower() == "true"
@@ -2,6 +2,7 @@
 # Menangani state global, VIP, subscribers, dan load/save konfigurasi bot.
 
 import json
+import logging
 import os
 import time
 from dataclasses import dataclass, field
@@ -19,6 +20,14 @@ SUBSCRIBERS_FILE = "subscribers.json"
 VIP_FILE = "vip_users.json"
 STATE_FILE = "bot_state.json"
 
+# Urutan tier sinyal: NONE < B < A < A+
+TIER_ORDER: Dict[str, int] = {"NONE": 0, "B": 1, "A": 2, "A+": 3}
+
+
+def _tier_rank(tier: str) -> int:
+    # tier kosong / tidak dikenal → anggap "A" (default lama filter tier)
+    return TIER_ORDER.get(tier or "A", 2)
+
 
 @dataclass
 class BotState:
@@ -30,6 +39,8 @@ class BotState:
     # sinyal & cooldown
     last_signal_time: Dict[str, float] = field(default_factory=dict)
     min_tier: str = MIN_TIER_TO_SEND
+    # rank dari min_tier (cache untuk filter tier imb_tiers) → ubah lewat set_min_tier()
+    min_tier_rank: int = _tier_rank(MIN_TIER_TO_SEND)
     cooldown_seconds: int = SIGNAL_COOLDOWN_SECONDS
     debug: bool = False
 
@@ -51,6 +62,24 @@ class BotState:
 state = BotState()
 
 
+def set_debug(enabled: bool) -> None:
+    """
+    Toggle debug: flag di state + level logger "imb" (log.debug di scanner
+    tidak diformat sama sekali selama level bukan DEBUG).
+    """
+    state.debug = enabled
+    logging.getLogger("imb").setLevel(logging.DEBUG if enabled else logging.INFO)
+
+
+def set_min_tier(tier: str) -> None:
+    """
+    Set minimal tier sinyal + rank-nya sekaligus, supaya filter tier
+    di analyzer cukup bandingkan dua int.
+    """
+    state.min_tier = tier
+    state.min_tier_rank = _tier_rank(tier)
+
+
 def is_admin(chat_id: int) -> bool:
     return TELEGRAM_ADMIN_ID and str(chat_id) == str(TELEGRAM_ADMIN_ID)
 
@@ -121,7 +150,7 @@ def load_bot_state() -> None:
         with open(STATE_FILE, "r", encoding="utf-8") as f:
             data = json.load(f)
         state.scanning = bool(data.get("scanning", False))
-        state.min_tier = data.get("min_tier", state.min_tier)
+        set_min_tier(data.get("min_tier", state.min_tier))
         state.cooldown_seconds = int(data.get("cooldown_seconds", state.cooldown_seconds))
         state.min_volume_usdt = float(data.get("min_volume_usdt", state.min_volume_usdt))
         state.max_pairs = int(data.get("max_pairs", state.max_pairs))
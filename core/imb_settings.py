@@ -5,6 +5,10 @@ from config import (
     IMB_USE_HTF_FILTER,
     IMB_MAX_ENTRY_AGE_CANDLES,
     IMB_MIN_RR_TP2,
+    IMB_IMPULSE_FACTOR,
+    IMB_MIN_RR_TP2_CUT,
+    IMB_MAX_SL_PCT,
+    IMB_MAX_ENTRY_DISTANCE_PCT,
     MIN_TIER_TO_SEND,
     IMB_STRICT_MODE,
 )
@@ -18,6 +22,12 @@ class IMBSettings:
     min_rr_tp2: float = IMB_MIN_RR_TP2
     min_tier_to_send: str = MIN_TIER_TO_SEND
 
+    # Parameter detektor (semi-strict)
+    impulse_factor: float = IMB_IMPULSE_FACTOR
+    max_sl_pct: float = IMB_MAX_SL_PCT
+    min_rr_tp2_cut: float = IMB_MIN_RR_TP2_CUT
+    max_entry_distance_pct: float = IMB_MAX_ENTRY_DISTANCE_PCT
+
     # STRICT MODE
     strict_mode: bool = IMB_STRICT_MODE
 
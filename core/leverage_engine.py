@@ -1,9 +1,22 @@
 # core/leverage_engine.py
 # Modul standar untuk rekomendasi leverage berdasarkan SL%.
 
+from bisect import bisect_left
 from typing import Tuple
 
 
+# Tabel leverage: batas atas SL% (inklusif) → (lev_min, lev_max).
+# Index 0 = SL <= 0 (tidak valid), index terakhir = SL di atas batas terbesar.
+_SL_BOUNDS: Tuple[float, ...] = (0.0, 0.40, 0.70, 1.20)
+_LEV_TABLE: Tuple[Tuple[float, float], ...] = (
+    (5.0, 10.0),
+    (15.0, 25.0),
+    (8.0, 15.0),
+    (5.0, 8.0),
+    (3.0, 5.0),
+)
+
+
 def recommend_leverage(sl_pct: float) -> Tuple[float, float]:
     """
     Rekomendasi leverage dinamis sesuai gaya SMC.
@@ -18,16 +31,5 @@ def recommend_leverage(sl_pct: float) -> Tuple[float, float]:
         SL ≤ 1.20% → 5x–8x
         > 1.20%    → 3x–5x
     """
-    if sl_pct <= 0:
-        return 5.0, 10.0
-
-    if sl_pct <= 0.40:
-        return 15.0, 25.0
-
-    elif sl_pct <= 0.70:
-        return 8.0, 15.0
-
-    elif sl_pct <= 1.20:
-        return 5.0, 8.0
-
-    return 3.0, 5.0
+    # bisect_left: SL tepat di batas ikut bucket batas itu (sama dengan `<=`)
+    return _LEV_TABLE[bisect_left(_SL_BOUNDS, sl_pct)]
@@ -0,0 +1,37 @@
+# core/numba_compat.py
+# Wrapper numba opsional: kalau numba tidak terpasang, @njit jadi no-op
+# dan kernel tetap jalan sebagai fungsi Python/NumPy biasa.
+#
+# Kernel ditulis dengan signature eksplisit → dikompilasi saat import (bukan
+# saat candle pertama close), dan dengan cache=True hasilnya disimpan di
+# NUMBA_CACHE_DIR sehingga restart bot berikutnya tinggal load dari disk.
+
+import config  # noqa: F401  (load .env dulu supaya NUMBA_CACHE_DIR terbaca numba)
+
+try:
+    from numba import njit as _numba_njit
+    from numba import prange
+
+    NUMBA_AVAILABLE = True
+except ImportError:
+    _numba_njit = None
+    prange = range  # tanpa numba: loop Python biasa
+    NUMBA_AVAILABLE = False
+
+
+def njit(*args, **kwargs):
+    """
+    Pengganti numba.njit. Bisa dipakai sebagai @njit, @njit(cache=True),
+    atau @njit("signature", cache=True).
+    """
+    if NUMBA_AVAILABLE:
+        return _numba_njit(*args, **kwargs)
+
+    # @njit tanpa argumen → args[0] adalah fungsinya
+    if len(args) == 1 and callable(args[0]) and not kwargs:
+        return args[0]
+
+    def decorator(func):
+        return func
+
+    return decorator
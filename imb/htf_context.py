@@ -3,214 +3,352 @@
 # - trend UP / DOWN / RANGE di 1h
 # - posisi harga di dalam range (DISCOUNT / PREMIUM / MID) untuk 1h & 15m
 
-from typing import Dict, List, Literal, Optional
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, List, Literal, Optional, Tuple
+import logging
+import threading
 import time
 
 import numpy as np
-import requests
 
-from config import BINANCE_REST_URL
+from binance.binance_rest import fetch_klines
+from core.imb_settings import imb_settings
+from core.numba_compat import njit
+
+log = logging.getLogger("imb")
 
 
 # TTL per timeframe
 HTF_TTL_1H = 3600      # 1 jam
 HTF_TTL_15M = 900      # 15 menit
 
+# HLC HTF disimpan float32: cukup untuk rasio harga / min / max di sini,
+# dan memori + bandwidth cache jadi setengah.
+HTF_DTYPE = np.float32
+
+# Batas jumlah entry cache (symbol, interval); yang paling lama tidak dipakai dibuang
+HTF_CACHE_MAXSIZE = 1024
+
+# Durasi 1 candle per interval (detik), untuk hitung jumlah candle baru sejak fetch terakhir
+_INTERVAL_SECONDS = {"1h": 3600, "15m": 900}
+
+
+@dataclass(slots=True)
+class HTFCacheEntry:
+    ts: float
+    hlc: Dict[str, np.ndarray]
+    # open_time (ms) candle terakhir di hlc; 0 = tidak bisa disambung (fetch penuh)
+    last_open_time: int = 0
+
+
 # Struktur cache:
 # _htf_cache = {
-#   "BTCUSDT": {
-#       "1h":  {"ts":..., "hlc": {...}},
-#       "15m": {"ts":..., "hlc": {...}},
-#   },
+#   ("BTCUSDT", "1h"):  HTFCacheEntry(ts=..., hlc={...}),
+#   ("BTCUSDT", "15m"): HTFCacheEntry(ts=..., hlc={...}),
 # }
-_htf_cache: Dict[str, Dict[str, Dict[str, object]]] = {}
+# OrderedDict = LRU: entry yang diakses dipindah ke belakang, eviksi dari depan.
+# Diakses dari banyak thread (to_thread analyzer + _htf_executor) → pakai lock.
+_htf_cache: "OrderedDict[Tuple[str, str], HTFCacheEntry]" = OrderedDict()
+_htf_lock = threading.Lock()
+
+# Cache hasil akhir ctx per symbol: (entry_1h, entry_15m, ctx).
+# ctx valid selama dua entry HLC yang dipakai masih sama (belum di-refresh),
+# jadi hit tidak perlu hitung ulang statistik HTF sama sekali.
+_ctx_cache: "OrderedDict[str, Tuple[HTFCacheEntry, HTFCacheEntry, Dict[str, object]]]" = OrderedDict()
+
+# Pool kecil untuk fetch 1h & 15m secara paralel saat dua-duanya expired
+_htf_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="htf")
+
+# Batas symbol yang di-fetch paralel oleh get_htf_contexts / warm_htf_contexts
+HTF_WARM_CONCURRENCY = 16
+
+# Warm cache HTF di background: sekali per siklus candle 5m. Entry yang akan
+# expired dalam HTF_WARM_AHEAD detik di-refresh duluan, jadi tidak pernah
+# expired sebelum putaran warm berikutnya (analyzer selalu dapat cache hangat).
+HTF_WARM_INTERVAL = 300
+HTF_WARM_AHEAD = HTF_WARM_INTERVAL + 60
+
+# Pool untuk fetch banyak symbol sekaligus. Terpisah dari _htf_executor karena
+# get_htf_context sendiri submit ke _htf_executor (hindari deadlock pool penuh).
+_htf_multi_executor = ThreadPoolExecutor(
+    max_workers=HTF_WARM_CONCURRENCY, thread_name_prefix="htf-multi"
+)
+
+# Pool warm_htf_contexts: sendiri, supaya warm ratusan symbol tidak mengantri
+# di depan fetch kandidat sinyal di _htf_multi_executor
+_htf_warm_executor = ThreadPoolExecutor(
+    max_workers=HTF_WARM_CONCURRENCY, thread_name_prefix="htf-warm"
+)
 
 
 def _fetch_klines(symbol: str, interval: str, limit: int = 150) -> Optional[List[dict]]:
-    url = f"{BINANCE_REST_URL}/fapi/v1/klines"
-    params = {"symbol": symbol.upper(), "interval": interval, "limit": limit}
     try:
-        r = requests.get(url, params=params, timeout=10)
-        r.raise_for_status()
-        return r.json()
+        return fetch_klines(symbol, interval, limit)
     except Exception as e:
-        print(f"[{symbol}] ERROR fetch HTF klines ({interval}):", e)
+        log.error("[%s] ERROR fetch HTF klines (%s): %s", symbol, interval, e)
         return None
 
 
-def _parse_ohlc(data: List[dict]) -> Dict[str, np.ndarray]:
-    highs = []
-    lows = []
-    closes = []
+def _parse_ohlc_rows(data: List[dict]) -> Dict[str, np.ndarray]:
+    """
+    Parser per-baris (lambat), hanya dipakai kalau ada baris yang rusak:
+    baris yang tidak bisa di-parse dilewati.
+    """
+    n = len(data)
+    highs = [0.0] * n
+    lows = [0.0] * n
+    closes = [0.0] * n
 
+    k = 0
     for row in data:
         try:
-            highs.append(float(row[2]))
-            lows.append(float(row[3]))
-            closes.append(float(row[4]))
+            h = float(row[2])
+            l = float(row[3])
+            c = float(row[4])
         except Exception:
             continue
+        highs[k] = h
+        lows[k] = l
+        closes[k] = c
+        k += 1
 
     return {
-        "high": np.asarray(highs, dtype=float),
-        "low": np.asarray(lows, dtype=float),
-        "close": np.asarray(closes, dtype=float),
+        "high": np.asarray(highs[:k], dtype=HTF_DTYPE),
+        "low": np.asarray(lows[:k], dtype=HTF_DTYPE),
+        "close": np.asarray(closes[:k], dtype=HTF_DTYPE),
     }
 
 
-def _detect_trend_1h(hlc: Dict[str, np.ndarray]) -> Literal["UP", "DOWN", "RANGE"]:
-    highs = hlc["high"]
-    lows = hlc["low"]
-    n = highs.size
-
-    if n < 20:
-        return "RANGE"
-
-    step = max(n // 10, 2)
-
-    swing_highs = highs[::step]
-    swing_lows = lows[::step]
-
-    if swing_highs.size < 3 or swing_lows.size < 3:
-        return "RANGE"
+def _parse_ohlc(data: List[dict]) -> Dict[str, np.ndarray]:
+    """
+    Parse klines Binance → dict array high/low/close.
+    Satu kali build array (n, 3), konversi float dikerjakan NumPy.
+    """
+    try:
+        arr = np.array([(row[2], row[3], row[4]) for row in data], dtype=HTF_DTYPE)
+    except (ValueError, TypeError, IndexError):
+        return _parse_ohlc_rows(data)
 
-    first_h = swing_highs[0]
-    last_h = swing_highs[-1]
-    first_l = swing_lows[0]
-    last_l = swing_lows[-1]
+    if arr.ndim != 2:
+        return _parse_ohlc_rows(data)
 
-    # threshold kecil untuk menghindari noise
-    if last_h > first_h * 1.01 and last_l > first_l * 1.005:
-        return "UP"
-    if last_h < first_h * 0.99 and last_l < first_l * 0.995:
-        return "DOWN"
+    return {
+        "high": arr[:, 0],
+        "low": arr[:, 1],
+        "close": arr[:, 2],
+    }
 
-    return "RANGE"
 
+# Kode hasil kernel (int) → label string
+_TREND_LABELS = ("RANGE", "UP", "DOWN")
+_POSITION_LABELS = ("MID", "DISCOUNT", "PREMIUM")
 
-def _discount_premium(
-    hlc: Dict[str, np.ndarray],
-    window: int = 60,
-) -> Dict[str, object]:
-    highs = hlc["high"]
-    lows = hlc["low"]
-    closes = hlc["close"]
 
+@njit(
+    "Tuple((int64, int64, float64, float64, float64))"
+    "(float32[:], float32[:], float32[:], int64)",
+    cache=True,
+)
+def _htf_stats_nb(
+    highs: np.ndarray,
+    lows: np.ndarray,
+    closes: np.ndarray,
+    window: int,
+) -> Tuple[int, int, float, float, float]:
+    """
+    Kernel gabungan trend + discount/premium dalam satu panggilan.
+    Return: (trend_code, pos_code, range_high, range_low, price)
+    trend_code: 0 = RANGE, 1 = UP, 2 = DOWN
+    pos_code  : 0 = MID, 1 = DISCOUNT, 2 = PREMIUM
+    NaN = tidak ada nilai.
+    """
     n = highs.size
+
+    # ---- trend: swing = setiap `step` candle, cukup baca titik pertama & terakhir ----
+    # (n >= 20 → step <= n // 10 → selalu ada >= 10 swing, tidak perlu cek jumlah swing)
+    trend_code = 0
+    if n >= 20:
+        step = max(n // 10, 2)
+        last = ((n - 1) // step) * step
+        first_h = highs[0]
+        last_h = highs[last]
+        first_l = lows[0]
+        last_l = lows[last]
+
+        # threshold kecil untuk menghindari noise
+        if last_h > first_h * 1.01 and last_l > first_l * 1.005:
+            trend_code = 1
+        elif last_h < first_h * 0.99 and last_l < first_l * 0.995:
+            trend_code = 2
+
+    # ---- discount / premium di range `window` candle terakhir ----
     if n < 5:
-        return {
-            "position": "MID",
-            "range_high": None,
-            "range_low": None,
-            "price": float(closes[-1]) if closes.size > 0 else None,
-        }
+        price = closes[-1] if closes.size > 0 else np.nan
+        return trend_code, 0, np.nan, np.nan, price
 
     start = max(0, n - window)
 
-    seg_high = highs[start:]
-    seg_low = lows[start:]
-    price = float(closes[-1])
-
-    range_high = float(seg_high.max())
-    range_low = float(seg_low.min())
+    price = closes[-1]
+    range_high = highs[start:].max()
+    range_low = lows[start:].min()
 
     if range_high <= range_low:
-        return {
-            "position": "MID",
-            "range_high": range_high,
-            "range_low": range_low,
-            "price": price,
-        }
+        return trend_code, 0, range_high, range_low, price
 
     pos = (price - range_low) / (range_high - range_low)
 
     if pos <= 0.35:
-        position = "DISCOUNT"
-    elif pos >= 0.65:
-        position = "PREMIUM"
-    else:
-        position = "MID"
+        return trend_code, 1, range_high, range_low, price
+    if pos >= 0.65:
+        return trend_code, 2, range_high, range_low, price
+    return trend_code, 0, range_high, range_low, price
+
+
+def _htf_stats(
+    hlc: Dict[str, np.ndarray],
+    window: int = 60,
+) -> Tuple[Literal["UP", "DOWN", "RANGE"], str]:
+    """
+    Return: (trend, position) dalam bentuk label.
+    """
+    trend_code, pos_code, _, _, _ = _htf_stats_nb(
+        hlc["high"], hlc["low"], hlc["close"], window
+    )
+    return _TREND_LABELS[trend_code], _POSITION_LABELS[pos_code]
+
+
+def _cache_get(key: Tuple[str, str]) -> Optional[HTFCacheEntry]:
+    with _htf_lock:
+        entry = _htf_cache.get(key)
+        if entry is not None:
+            _htf_cache.move_to_end(key)
+        return entry
 
-    return {
-        "position": position,
-        "range_high": range_high,
-        "range_low": range_low,
-        "price": price,
-    }
 
+def _cache_put(key: Tuple[str, str], entry: HTFCacheEntry) -> None:
+    with _htf_lock:
+        _htf_cache[key] = entry
+        _htf_cache.move_to_end(key)
+        while len(_htf_cache) > HTF_CACHE_MAXSIZE:
+            _htf_cache.popitem(last=False)
+
+
+def _cached_entry(symbol_u: str, interval: str, ttl: int) -> Optional[HTFCacheEntry]:
+    """
+    Entry cache kalau belum kadaluarsa, selain itu None.
+    """
+    entry = _cache_get((symbol_u, interval))
+    if entry is not None and (time.time() - entry.ts) < ttl:
+        return entry
+    return None
 
-def _get_hlc_cached(
+
+def _refresh_entry(
     symbol_u: str,
     interval: str,
     limit: int,
-    ttl: int,
-) -> Optional[Dict[str, np.ndarray]]:
+) -> Optional[HTFCacheEntry]:
     """
-    Ambil HLC (high/low/close) dari cache jika belum kadaluarsa,
-    kalau sudah expired → fetch dari REST + update cache.
+    Fetch HLC (high/low/close) dari REST + update cache.
     """
+    key = (symbol_u, interval)
     now = time.time()
-    sym_cache = _htf_cache.get(symbol_u)
-    tf_cache = sym_cache.get(interval) if sym_cache else None
-
-    if tf_cache:
-        ts = float(tf_cache.get("ts", 0.0))
-        hlc = tf_cache.get("hlc")
-        if hlc is not None and (now - ts) < ttl:
-            return hlc  # pakai data cached
+    old = _cache_get(key)
+
+    # Sudah ada HLC lama → cukup ambil beberapa candle terbaru lalu sambung
+    # (Binance tidak kirim ETag/Last-Modified untuk klines, jadi tidak ada 304).
+    n_recent = _recent_rows_needed(old, interval, now, limit)
+    if n_recent:
+        data = _fetch_klines(symbol_u, interval, n_recent)
+        if not data:
+            return old
+        entry = _splice_recent(old, data, limit, now)
+        if entry is not None:
+            _cache_put(key, entry)
+            return entry
 
-    # butuh fetch baru
     data = _fetch_klines(symbol_u, interval, limit)
     if not data:
         # gagal fetch → jangan overwrite cache hlc lama,
         # supaya masih bisa pakai data sebelumnya (kalau ada)
-        if tf_cache and "hlc" in tf_cache:
-            return tf_cache["hlc"]
-        return None
+        return old
 
     hlc = _parse_ohlc(data)
+    # ada baris rusak yang dilewati → index tidak lagi sejajar waktu, jangan disambung nanti
+    last_open_time = _row_open_time(data[-1]) if hlc["close"].size == len(data) else 0
+    entry = HTFCacheEntry(ts=now, hlc=hlc, last_open_time=last_open_time)
+    _cache_put(key, entry)
 
-    if sym_cache is None:
-        sym_cache = {}
-        _htf_cache[symbol_u] = sym_cache
+    return entry
 
-    sym_cache[interval] = {
-        "ts": now,
-        "hlc": hlc,
-    }
 
-    return hlc
+def _row_open_time(row: list) -> int:
+    try:
+        return int(row[0])
+    except (ValueError, TypeError, IndexError):
+        return 0
 
 
-def get_htf_context(symbol: str) -> Dict[str, object]:
+def _recent_rows_needed(
+    old: Optional[HTFCacheEntry],
+    interval: str,
+    now: float,
+    limit: int,
+) -> int:
     """
-    Ambil konteks 1h & 15m untuk symbol (tanpa indikator klasik),
-    dengan caching terpisah:
-    - 1h: refresh setiap HTF_TTL_1H
-    - 15m: refresh setiap HTF_TTL_15M
+    Jumlah candle terbaru yang perlu di-fetch untuk menyambung `old`
+    (candle terakhir lama yang dulu masih berjalan + candle baru sesudahnya).
+    0 = harus fetch penuh.
     """
-    symbol_u = symbol.upper()
+    step = _INTERVAL_SECONDS.get(interval)
+    if old is None or not old.last_open_time or step is None:
+        return 0
 
-    ctx_default = {
-        "trend_1h": "RANGE",
-        "pos_1h": "MID",
-        "pos_15m": "MID",
-        "htf_ok_long": True,
-        "htf_ok_short": True,
-    }
+    n_recent = int((now - old.ts) // step) + 2
+    return n_recent if n_recent < limit else 0
 
-    hlc_1h = _get_hlc_cached(symbol_u, "1h", 150, HTF_TTL_1H)
-    hlc_15m = _get_hlc_cached(symbol_u, "15m", 150, HTF_TTL_15M)
 
-    if hlc_1h is None or hlc_15m is None:
-        return ctx_default
+def _splice_recent(
+    old: HTFCacheEntry,
+    data: List[list],
+    limit: int,
+    now: float,
+) -> Optional[HTFCacheEntry]:
+    """
+    Sambung klines terbaru ke HLC lama: baris yang open_time-nya sudah ada
+    di cache menimpa baris lama, sisanya ditambahkan, lalu dipotong ke `limit`.
+    None kalau tidak nyambung (ada candle terlewat) atau ada baris rusak.
+    """
+    try:
+        open_times = [int(row[0]) for row in data]
+        recent = np.array([(row[2], row[3], row[4]) for row in data], dtype=HTF_DTYPE)
+    except (ValueError, TypeError, IndexError):
+        return None
+
+    if recent.ndim != 2 or open_times[0] > old.last_open_time:
+        return None
+
+    n_old = old.hlc["close"].size
+    n_overlap = sum(1 for t in open_times if t <= old.last_open_time)
+    if n_overlap > n_old:
+        return None
+
+    keep = n_old - n_overlap
+    hlc = {
+        name: np.concatenate((old.hlc[name][:keep], recent[:, col]))[-limit:]
+        for col, name in enumerate(("high", "low", "close"))
+    }
+    return HTFCacheEntry(ts=now, hlc=hlc, last_open_time=open_times[-1])
 
-    trend_1h = _detect_trend_1h(hlc_1h)
-    pos1 = _discount_premium(hlc_1h)
-    pos15 = _discount_premium(hlc_15m)
 
-    pos_1h = pos1["position"]
-    pos_15m = pos15["position"]
+def _build_ctx(
+    hlc_1h: Dict[str, np.ndarray],
+    hlc_15m: Dict[str, np.ndarray],
+) -> Dict[str, object]:
+    trend_1h, pos_1h = _htf_stats(hlc_1h)
+    _, pos_15m = _htf_stats(hlc_15m)
 
     # aturan sederhana:
     # LONG ideal: 1h bukan DOWN kuat + 1h & 15m bukan PREMIUM
@@ -230,3 +368,138 @@ def get_htf_context(symbol: str) -> Dict[str, object]:
         "htf_ok_long": htf_ok_long,
         "htf_ok_short": htf_ok_short,
     }
+
+
+# Konteks netral: dipakai kalau filter HTF mati atau data HTF tidak tersedia.
+# Selalu dikembalikan sebagai salinan (dict(_CTX_DEFAULT)), karena ctx ikut
+# tersimpan di hasil sinyal dan tidak boleh mengubah default symbol lain.
+_CTX_DEFAULT: Dict[str, object] = {
+    "trend_1h": "RANGE",
+    "pos_1h": "MID",
+    "pos_15m": "MID",
+    "htf_ok_long": True,
+    "htf_ok_short": True,
+}
+
+
+def _store_ctx(
+    symbol_u: str,
+    entry_1h: HTFCacheEntry,
+    entry_15m: HTFCacheEntry,
+) -> Dict[str, object]:
+    """
+    Hitung ctx dari dua entry HLC lalu simpan di _ctx_cache.
+    """
+    ctx = _build_ctx(entry_1h.hlc, entry_15m.hlc)
+
+    with _htf_lock:
+        _ctx_cache[symbol_u] = (entry_1h, entry_15m, ctx)
+        _ctx_cache.move_to_end(symbol_u)
+        while len(_ctx_cache) > HTF_CACHE_MAXSIZE:
+            _ctx_cache.popitem(last=False)
+
+    return ctx
+
+
+def _cached_ctx(symbol_u: str) -> Optional[Dict[str, object]]:
+    """
+    ctx dari cache saja (tanpa REST): None kalau entry 1h / 15m belum ada
+    atau sudah expired.
+    """
+    entry_1h = _cached_entry(symbol_u, "1h", HTF_TTL_1H)
+    entry_15m = _cached_entry(symbol_u, "15m", HTF_TTL_15M)
+    if entry_1h is None or entry_15m is None:
+        return None
+
+    # HLC belum berubah sejak ctx terakhir dihitung → pakai ctx lama
+    with _htf_lock:
+        cached = _ctx_cache.get(symbol_u)
+        if cached is not None and cached[0] is entry_1h and cached[1] is entry_15m:
+            _ctx_cache.move_to_end(symbol_u)  # LRU, sama seperti _cache_get
+            return cached[2]
+
+    return _store_ctx(symbol_u, entry_1h, entry_15m)
+
+
+def peek_htf_context(symbol: str) -> Optional[Dict[str, object]]:
+    """
+    Seperti get_htf_context tapi TIDAK PERNAH fetch REST: None kalau konteks
+    symbol belum ada / expired di cache. Aman dipakai sebagai pre-filter
+    murah untuk banyak symbol sekaligus.
+    """
+    if not imb_settings.use_htf_filter:
+        return dict(_CTX_DEFAULT)
+    return _cached_ctx(symbol.upper())
+
+
+def get_htf_context(symbol: str) -> Dict[str, object]:
+    """
+    Ambil konteks 1h & 15m untuk symbol (tanpa indikator klasik),
+    dengan caching terpisah:
+    - 1h: refresh setiap HTF_TTL_1H
+    - 15m: refresh setiap HTF_TTL_15M
+    Hasil ctx ikut di-cache selama HLC 1h & 15m belum di-refresh.
+    Jika IMB_USE_HTF_FILTER = false → langsung konteks netral.
+    """
+    # filter HTF dimatikan → tidak perlu fetch REST sama sekali
+    if not imb_settings.use_htf_filter:
+        return dict(_CTX_DEFAULT)
+
+    symbol_u = symbol.upper()
+
+    ctx = _cached_ctx(symbol_u)
+    if ctx is not None:
+        return ctx
+
+    entry_1h = _cached_entry(symbol_u, "1h", HTF_TTL_1H)
+    entry_15m = _cached_entry(symbol_u, "15m", HTF_TTL_15M)
+
+    # dua-duanya expired → fetch 1h & 15m paralel (1 RTT, bukan 2)
+    if entry_1h is None and entry_15m is None:
+        fut_1h = _htf_executor.submit(_refresh_entry, symbol_u, "1h", 150)
+        entry_15m = _refresh_entry(symbol_u, "15m", 150)
+        entry_1h = fut_1h.result()
+    elif entry_1h is None:
+        entry_1h = _refresh_entry(symbol_u, "1h", 150)
+    elif entry_15m is None:
+        entry_15m = _refresh_entry(symbol_u, "15m", 150)
+
+    if entry_1h is None or entry_15m is None:
+        return dict(_CTX_DEFAULT)
+
+    return _store_ctx(symbol_u, entry_1h, entry_15m)
+
+
+def get_htf_contexts(symbols: List[str]) -> List[Dict[str, object]]:
+    """
+    get_htf_context untuk banyak symbol (urutan hasil = urutan `symbols`).
+    Symbol yang perlu fetch REST diambil paralel, bukan satu per satu.
+    """
+    if len(symbols) <= 1:
+        return [get_htf_context(sym) for sym in symbols]
+    return list(_htf_multi_executor.map(get_htf_context, symbols))
+
+
+def _warm_symbol(symbol: str, ahead: float) -> None:
+    """
+    Refresh entry 1h / 15m symbol yang sudah / akan expired dalam `ahead`
+    detik, lalu hitung ulang ctx-nya.
+    """
+    symbol_u = symbol.upper()
+    for interval, ttl in (("1h", HTF_TTL_1H), ("15m", HTF_TTL_15M)):
+        if _cached_entry(symbol_u, interval, ttl - ahead) is None:
+            _refresh_entry(symbol_u, interval, 150)
+    _cached_ctx(symbol_u)
+
+
+def warm_htf_contexts(symbols: List[str], ahead: float = 0.0) -> None:
+    """
+    Isi / refresh cache HTF untuk banyak symbol sekaligus (fetch paralel,
+    dibatasi HTF_WARM_CONCURRENCY), supaya analyzer tidak menunggu REST.
+    ahead: refresh juga entry yang akan expired dalam `ahead` detik
+    (0 = hanya yang belum ada / sudah expired, mis. setelah refresh pair).
+    """
+    if not imb_settings.use_htf_filter or not symbols:
+        return
+
+    list(_htf_warm_executor.map(lambda sym: _warm_symbol(sym, ahead), symbols))
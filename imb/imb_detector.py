@@ -2,94 +2,70 @@
 # Deteksi setup IMB (Institutional Mitigation Block) + bangun Entry/SL/TP.
 # Versi semi-strict: lebih longgar dari versi sebelumnya tapi tetap pakai filter kualitas.
 
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+import threading
+
 import numpy as np
 
-from binance.ohlc_buffer import Candle
+from binance.ohlc_buffer import CandleArrays
 from core.imb_settings import imb_settings
-from imb.htf_context import get_htf_context
-from imb.imb_tiers import evaluate_signal_quality
+from imb.htf_context import get_htf_contexts, peek_htf_context
+from imb.imb_kernels import find_block_nb, find_impulse_batch_nb
+from imb.imb_tiers import evaluate_signal_quality_fast
 from imb.liquidity_sweep import detect_liquidity_sweep
 from core.leverage_engine import recommend_leverage
 
 
-# ==============================
-# NumPy helper
-# ==============================
-
-def _candle_arrays(candles: List[Candle]):
-    """
-    Convert list Candle -> NumPy arrays:
-    opens, highs, lows, closes
-    """
-    if not candles:
-        return None, None, None, None
-
-    opens = np.fromiter((c["open"] for c in candles), dtype=float)
-    highs = np.fromiter((c["high"] for c in candles), dtype=float)
-    lows = np.fromiter((c["low"] for c in candles), dtype=float)
-    closes = np.fromiter((c["close"] for c in candles), dtype=float)
-
-    return opens, highs, lows, closes
+# find_impulse_batch_nb pakai parallel=True; threading layer "workqueue" numba
+# (fallback kalau tbb / OpenMP tidak ada) abort kalau kernel paralel dipanggil
+# dari beberapa thread sekaligus (mis. dua batch close tumpang tindih).
+_batch_kernel_lock = threading.Lock()
 
 
-def _avg_body(candles: List[Candle], lookback: int = 30) -> float:
+class Levels(NamedTuple):
     """
-    Rata-rata body |close-open|, pakai NumPy.
+    Hasil _build_levels (harga Entry / SL / TP, SL% & rekomendasi leverage).
     """
-    if not candles:
-        return 0.0
+    entry: float
+    sl: float
+    tp1: float
+    tp2: float
+    tp3: float
+    sl_pct: float
+    lev_min: float
+    lev_max: float
 
-    opens, _, _, closes = _candle_arrays(candles)
-    if opens is None or closes is None or opens.size == 0:
-        return 0.0
 
-    if lookback and opens.size > lookback:
-        opens = opens[-lookback:]
-        closes = closes[-lookback:]
-
-    bodies = np.abs(closes - opens)
-    return float(bodies.mean()) if bodies.size > 0 else 0.0
+# ==============================
+# Template pesan Telegram (di-compile sekali saat import)
+# ==============================
 
+_SIGNAL_MESSAGE = (
+    "{emoji} IMB SIGNAL — {symbol} ({direction})\n"
+    "Entry : `{entry:.6f}`\n"
+    "SL    : `{sl:.6f}`\n"
+    "TP1   : `{tp1:.6f}`\n"
+    "TP2   : `{tp2:.6f}`\n"
+    "TP3   : `{tp3:.6f}`\n"
+    "Model : IMB Mitigation Block (Semi-Strict)\n"
+    "Rekomendasi Leverage : {lev_min:.0f}x–{lev_max:.0f}x (SL {sl_pct:.2f}%)\n"
+    "Validitas Entry : {valid_text}\n"
+    "Tier : {tier} (Score {score})\n"
+    "{risk_calc}"
+).format
+
+_RISK_CALC = (
+    "Risk Calc (contoh risiko 1%):\n"
+    "• SL : {sl_pct:.2f}% → nilai posisi ≈ (1% / SL%) × balance ≈ {pos_mult:.1f}× balance\n"
+    "• Contoh balance 100 USDT → posisi ≈ {example_pos:.0f} USDT\n"
+    "(sesuaikan dengan balance & leverage kamu)"
+).format
 
 # ==============================
 # IMB building blocks
 # ==============================
 
-def _find_impulse(
-    opens: np.ndarray,
-    closes: np.ndarray,
-    avg_body: float,
-    lookback_tail: int = 30,
-    factor: float = 1.8,
-) -> Optional[int]:
-    """
-    Cari candle impuls:
-    - body >= factor * avg_body
-    - fokus di lookback_tail candle terakhir.
-    Versi lebih longgar dari sebelumnya (factor diturunkan).
-    """
-    n = opens.size
-    if n < 20 or avg_body <= 0:
-        return None
-
-    bodies = np.abs(closes - opens)
-
-    start = max(0, n - lookback_tail)
-    tail = bodies[start:]
-
-    mask = tail >= (factor * avg_body)
-    if not mask.any():
-        return None
-
-    idx_candidates = np.nonzero(mask)[0] + start
-    best_local = bodies[idx_candidates].argmax()
-    best_idx = int(idx_candidates[best_local])
-    return best_idx
-
-
 def _find_block_and_filters(
-    candles: List[Candle],
     opens: np.ndarray,
     highs: np.ndarray,
     lows: np.ndarray,
@@ -102,6 +78,7 @@ def _find_block_and_filters(
     - blok = 1–3 candle berlawanan sebelum impuls
     - candle blok tidak harus besar sekali, cukup >= 0.5 * avg_body
     - FVG & BOS tidak lagi hard filter, tapi di-return sebagai flag kualitas.
+    Kerja numerik di kernel find_block_nb (imb/imb_kernels.py).
 
     Return:
       (block_low, block_high, side, has_fvg, bos_ok)
@@ -109,75 +86,13 @@ def _find_block_and_filters(
     if imp_idx is None or imp_idx <= 0:
         return None
 
-    imp_open = opens[imp_idx]
-    imp_close = closes[imp_idx]
-    side = "long" if imp_close > imp_open else "short"
-
-    n = opens.size
-
-    # ---- cari blok: 1–3 candle sebelum impuls, warna berlawanan & body lumayan ----
-    start = max(0, imp_idx - 3)
-    end = imp_idx
-
-    block_highs: List[float] = []
-    block_lows: List[float] = []
-
-    min_block_body = 0.5 * avg_body  # longgar: cukup setengah avg_body
-
-    for i in range(start, end):
-        o = opens[i]
-        c = closes[i]
-        body = abs(c - o)
-
-        if body < min_block_body:
-            continue  # candle terlalu kecil → skip
-
-        if side == "long":
-            # butuh candle merah sebelum impuls hijau
-            if c < o:
-                block_highs.append(highs[i])
-                block_lows.append(lows[i])
-        else:
-            # side short → candle hijau sebelum impuls merah
-            if c > o:
-                block_highs.append(highs[i])
-                block_lows.append(lows[i])
-
-    if not block_highs or not block_lows:
-        return None
-
-    block_high = max(block_highs)
-    block_low = min(block_lows)
-
-    if block_high <= block_low:
+    block_low, block_high, side_code, has_fvg, bos_ok = find_block_nb(
+        opens, highs, lows, closes, imp_idx, float(avg_body)
+    )
+    if side_code == 0:
         return None
 
-    # ---- flag FVG (tidak wajib, hanya kualitas) ----
-    imp_high = highs[imp_idx]
-    imp_low = lows[imp_idx]
-
-    if side == "long":
-        # cari gap antara block_high dan low impuls
-        has_fvg = imp_low > block_high
-    else:
-        has_fvg = imp_high < block_low
-
-    # ---- flag BOS (juga tidak wajib, tapi kualitas) ----
-    pre_start = max(0, start - 10)
-    pre_end = start
-
-    bos_ok = False
-    if pre_end > pre_start:
-        pre_highs = highs[pre_start:pre_end]
-        pre_lows = lows[pre_start:pre_end]
-
-        if side == "long":
-            prev_struct_high = float(pre_highs.max())
-            bos_ok = imp_high > prev_struct_high * 1.0005 or imp_close > prev_struct_high * 1.0005
-        else:
-            prev_struct_low = float(pre_lows.min())
-            bos_ok = imp_low < prev_struct_low * 0.9995 or imp_close < prev_struct_low * 0.9995
-
+    side = "long" if side_code == 1 else "short"
     return block_low, block_high, side, has_fvg, bos_ok
 
 
@@ -186,7 +101,7 @@ def _find_block_and_filters(
 # ==============================
 
 def _dynamic_tp_factors(
-    candles: List[Candle],
+    bodies: np.ndarray,
     impulse_idx: int,
     block_low: float,
     block_high: float,
@@ -198,15 +113,14 @@ def _dynamic_tp_factors(
     Menggabungkan kekuatan impuls, range IMB, dan volatilitas avg body.
     Semakin kuat impuls & semakin besar block_range dibanding vol,
     semakin besar potensi TP.
+    bodies: |close-open| semua candle (dihitung sekali oleh analyzer).
     """
-    imp = candles[impulse_idx]
-    impulse_strength = abs(imp["close"] - imp["open"])
+    impulse_strength = float(bodies[impulse_idx])
 
-    block_range = abs(block_high - block_low)
+    block_range = block_high - block_low  # block_high >= block_low dari kernel
 
-    sub = candles[-20:]
-    bodies = [abs(c["close"] - c["open"]) for c in sub]
-    vol = sum(bodies) / len(bodies) if bodies else impulse_strength
+    recent = bodies[-20:]
+    vol = float(recent.mean()) if recent.size > 0 else impulse_strength
 
     tp_factor = 1.0
     tp_factor += impulse_strength / max(vol, 1e-9)
@@ -226,9 +140,9 @@ def _build_levels(
     block_low: float,
     block_high: float,
     last_price: float,
-    candles_5m: List[Candle],
+    bodies: np.ndarray,
     imp_idx: int,
-) -> Dict[str, float]:
+) -> Levels:
     """
     IMB Dynamic SL + Dynamic TP + Dynamic Leverage:
     - Entry: di area block (anti-FOMO sedikit)
@@ -237,149 +151,234 @@ def _build_levels(
     - SL% : dipakai untuk rekomendasi leverage.
     """
 
-    # ---------- ENTRY ----------
+    # TP faktor & tinggi block tidak tergantung arah → hitung sekali di luar cabang
+    tp_factor = _dynamic_tp_factors(bodies, imp_idx, block_low, block_high)
+    block_range = block_high - block_low
+
+    # Harga selalu > 0 dan risk >= 0 (dijaga fallback), jadi abs() tidak perlu
+    # di bawah ini maupun di filter RR analyzer.
+
+    # Arah dicek sekali; tiap cabang berisi Entry → buffer → SL → TP untuk arah itu.
     if side == "long":
+        # ---------- ENTRY ----------
         entry = min(block_low, last_price)
-    else:
-        entry = max(block_high, last_price)
 
-    # ---------- BUFFER DINAMIS ----------
-    block_range = abs(block_high - block_low)
-    base_buffer = max(
-        block_range * 0.30,    # 30% dari tinggi block
-        abs(entry) * 0.0005    # minimal ~0.05% dari harga
-    )
+        # ---------- BUFFER DINAMIS ----------
+        base_buffer = max(
+            block_range * 0.30,    # 30% dari tinggi block
+            entry * 0.0005         # minimal ~0.05% dari harga
+        )
 
-    # ---------- SL DINAMIS ----------
-    if side == "long":
-        raw_sl = block_low - base_buffer
+        # ---------- SL DINAMIS ----------
         # jaga SL selalu di bawah entry
-        sl = min(raw_sl, entry * 0.9990)
+        sl = min(block_low - base_buffer, entry * 0.9990)
         risk = entry - sl
-    else:
-        raw_sl = block_high + base_buffer
-        sl = max(raw_sl, entry * 1.0010)
-        risk = sl - entry
 
-    # fallback jika ada kasus aneh
-    if risk <= 0:
-        risk = abs(entry) * 0.003
-        if side == "long":
+        # fallback jika ada kasus aneh
+        if risk <= 0:
+            risk = entry * 0.003
             sl = entry - risk
-        else:
-            sl = entry + risk
 
-    # ---------- TP DINAMIS ----------
-    tp_factor = _dynamic_tp_factors(candles_5m, imp_idx, block_low, block_high)
-
-    if side == "long":
+        # ---------- TP DINAMIS ----------
         tp1 = entry + risk * (tp_factor * 0.50)
         tp2 = entry + risk * (tp_factor * 0.90)
         tp3 = entry + risk * tp_factor
     else:
+        entry = max(block_high, last_price)
+
+        base_buffer = max(
+            block_range * 0.30,
+            entry * 0.0005
+        )
+
+        # jaga SL selalu di atas entry
+        sl = max(block_high + base_buffer, entry * 1.0010)
+        risk = sl - entry
+
+        if risk <= 0:
+            risk = entry * 0.003
+            sl = entry + risk
+
         tp1 = entry - risk * (tp_factor * 0.50)
         tp2 = entry - risk * (tp_factor * 0.90)
         tp3 = entry - risk * tp_factor
 
     # ---------- SL% & LEVERAGE ----------
-    sl_pct = abs(risk / entry) * 100.0 if entry != 0 else 0.0
+    sl_pct = risk / entry * 100.0 if entry > 0 else 0.0
     lev_min, lev_max = recommend_leverage(sl_pct)
 
-    return {
-        "entry": float(entry),
-        "sl": float(sl),
-        "tp1": float(tp1),
-        "tp2": float(tp2),
-        "tp3": float(tp3),
-        "sl_pct": float(sl_pct),
-        "lev_min": float(lev_min),
-        "lev_max": float(lev_max),
-    }
+    # Semua input sudah float Python (lihat _analyze_setup), tidak perlu cast ulang
+    return Levels(entry, sl, tp1, tp2, tp3, sl_pct, lev_min, lev_max)
 
 
 # ==============================
 # Main analyzer
 # ==============================
 
-def analyze_symbol_imb(symbol: str, candles_5m: List[Candle]) -> Optional[Dict]:
+def _htf_allows_any(htf_ctx: Dict) -> bool:
+    """
+    True kalau HTF masih mengizinkan minimal satu arah (long / short).
     """
-    Analisa IMB untuk satu symbol menggunakan data 5m.
+    return bool(htf_ctx.get("htf_ok_long", True)) or bool(htf_ctx.get("htf_ok_short", True))
+
+
+def analyze_symbols_batch(
+    items: Sequence[Tuple[str, CandleArrays]],
+    avg_bodies: Optional[Sequence[float]] = None,
+) -> List[Tuple[str, Dict]]:
+    """
+    Analisa IMB (data 5m, kolom NumPy dari OHLCBufferManager) untuk banyak
+    symbol sekaligus (mis. semua candle 5m yang close bersamaan); satu symbol
+    = batch berisi satu item.
     Versi semi-strict: lebih longgar daripada versi sebelumnya, tapi tetap menjaga kualitas.
+    Scan impuls semua symbol jalan di satu kernel (paralel per symbol); hanya
+    symbol yang punya impuls yang lanjut ke blok / level / HTF di Python. HTF sebelum kernel hanya dibaca dari cache; yang belum ada
+    di-fetch (paralel) hanya untuk kandidat yang punya setup.
+    avg_bodies: rata-rata body per item (sejajar `items`) kalau sudah ada,
+    None → dihitung di sini.
+    Return: list (symbol, result) yang lolos semua filter.
     """
-    if len(candles_5m) < 40:
-        return None
+    tail = 30  # = lookback avg body & lookback impuls
+    ready = []
+    ready_avg = []
+    htf_ctxs = []
+    for i, (sym, c) in enumerate(items):
+        if c.close.size < 40:
+            continue
+        # pre-filter HTF dari cache saja; None = belum di cache, dicek setelah kernel
+        htf_ctx = peek_htf_context(sym)
+        if htf_ctx is not None and not _htf_allows_any(htf_ctx):
+            continue
+        ready.append((sym, c))
+        htf_ctxs.append(htf_ctx)
+        if avg_bodies is not None:
+            ready_avg.append(avg_bodies[i])
+    if not ready:
+        return []
+
+    opens_2d = np.stack([c.open[-tail:] for _, c in ready])
+    closes_2d = np.stack([c.close[-tail:] for _, c in ready])
+    if avg_bodies is not None:
+        avg_arr = np.asarray(ready_avg, dtype=np.float64)
+    else:
+        avg_arr = np.abs(closes_2d - opens_2d).mean(axis=1)
 
-    opens, highs, lows, closes = _candle_arrays(candles_5m)
-    if opens is None or highs is None or lows is None or closes is None:
-        return None
+    imp_tail = np.empty(len(ready), dtype=np.int64)
+    with _batch_kernel_lock:
+        find_impulse_batch_nb(
+            opens_2d, closes_2d, avg_arr, imb_settings.impulse_factor, imp_tail
+        )
 
-    avg_body = _avg_body(candles_5m)
-    if avg_body <= 0:
-        return None
+    # kandidat = punya impuls + blok valid (urutan sama dengan `items`)
+    setups = []
+    for k in np.flatnonzero(imp_tail >= 0):
+        symbol, candles = ready[k]
+        # index ekor → index absolut di array symbol
+        imp_idx = candles.close.size - tail + int(imp_tail[k])
+        block_info = _find_block_and_filters(
+            candles.open, candles.high, candles.low, candles.close,
+            imp_idx, float(avg_arr[k]),
+        )
+        if block_info:
+            setups.append((k, symbol, candles, imp_idx, block_info))
 
-    # 1) Cari impuls yang cukup kuat (lebih longgar dari versi strict)
-    imp_idx = _find_impulse(opens, closes, avg_body, lookback_tail=30, factor=1.8)
-    if imp_idx is None:
-        return None
+    # HTF yang belum ada di cache: hanya untuk kandidat, di-fetch paralel
+    missing = [symbol for k, symbol, _, _, _ in setups if htf_ctxs[k] is None]
+    fetched = dict(zip(missing, get_htf_contexts(missing))) if missing else {}
 
-    # 2) Cari blok IMB + flag FVG & BOS (tidak lagi hard filter)
-    block_info = _find_block_and_filters(
-        candles_5m, opens, highs, lows, closes, imp_idx, avg_body
-    )
-    if not block_info:
+    results: List[Tuple[str, Dict]] = []
+    for k, symbol, candles, imp_idx, block_info in setups:
+        htf_ctx = htf_ctxs[k]
+        if htf_ctx is None:
+            htf_ctx = fetched[symbol]
+        result = _analyze_setup(symbol, candles, imp_idx, *block_info, htf_ctx)
+        if result:
+            results.append((symbol, result))
+
+    return results
+
+
+def _analyze_setup(
+    symbol: str,
+    candles_5m: CandleArrays,
+    imp_idx: int,
+    block_low: float,
+    block_high: float,
+    side: str,
+    has_fvg: bool,
+    bos_ok: bool,
+    htf_ctx: Dict,
+) -> Optional[Dict]:
+    """
+    Lanjutan analyze_symbols_batch setelah impuls & blok ditemukan:
+    HTF searah, level + filter, sweep, scoring & pesan.
+    Filter murah dijalankan duluan supaya kandidat gagal berhenti secepatnya.
+    """
+    opens = candles_5m.open
+    highs = candles_5m.high
+    lows = candles_5m.low
+    closes = candles_5m.close
+
+    # 3) HTF tetap wajib searah (ini penting, tidak saya longgarkan).
+    #    Cuma baca dict, jadi dicek sebelum bangun level.
+    if side == "long":
+        htf_alignment = bool(htf_ctx.get("htf_ok_long", True))
+    else:
+        htf_alignment = bool(htf_ctx.get("htf_ok_short", True))
+
+    if not htf_alignment:
         return None
 
-    block_low, block_high, side, has_fvg, bos_ok = block_info
-    last_price = candles_5m[-1]["close"]
+    last_price = float(closes[-1])
+    block_low = float(block_low)
+    block_high = float(block_high)
 
-    # 3) Deteksi liquidity sweep (tidak wajib, jadi faktor kualitas saja)
-    sweep_ok = detect_liquidity_sweep(candles_5m, side, imp_idx)
+    # Entry tidak boleh terlalu jauh dari harga sekarang (default >0.8%).
+    # Entry = min(block_low, harga) untuk long / max(block_high, harga) untuk short,
+    # jadi jaraknya sudah bisa dicek dari batas block SEBELUM _build_levels.
+    # Dibandingkan dalam satuan harga (tanpa bagi / konversi persen).
+    if last_price <= 0:
+        return None
+    max_distance = last_price * (imb_settings.max_entry_distance_pct * 0.01)
+    if side == "long":
+        entry_distance = last_price - block_low
+    else:
+        entry_distance = block_high - last_price
+    if entry_distance > max_distance:
+        return None
 
-    # 4) Bangun level (Entry / SL / TP / leverage) dengan model dinamis
+    # 4) Bangun level (Entry / SL / TP / leverage) dengan model dinamis.
+    #    Batas block dari kernel sudah di-cast di atas; sisanya aritmetika float biasa.
     levels = _build_levels(
         side=side,
         block_low=block_low,
         block_high=block_high,
         last_price=last_price,
-        candles_5m=candles_5m,
+        bodies=np.abs(closes - opens),
         imp_idx=imp_idx,
     )
 
-    entry = levels["entry"]
-    sl = levels["sl"]
-    tp1 = levels["tp1"]
-    tp2 = levels["tp2"]
-    tp3 = levels["tp3"]
-    sl_pct = levels["sl_pct"]
+    entry, sl, tp1, tp2, tp3, sl_pct, lev_min, lev_max = levels
 
     # ---------- FILTER LANJUTAN (DILONGGARKAN) ----------
 
-    # SL% harus > 0 dan tidak terlalu besar (longgar sampai 1.5%)
-    if sl_pct <= 0 or sl_pct > 1.5:
+    # SL% harus > 0 dan tidak terlalu besar (default longgar sampai 1.5%)
+    if sl_pct <= 0 or sl_pct > imb_settings.max_sl_pct:
         return None
 
-    # RR minimal: TP2 >= 1.6R (bukan 2.0R lagi)
-    risk = abs(entry - sl)
+    # RR minimal ke TP2 (default 1.6R, bukan 2.0R lagi)
+    # SL selalu di sisi berlawanan TP → cukup kalikan tanda arah, tanpa abs()
+    sign = 1.0 if side == "long" else -1.0
+    risk = sign * (entry - sl)
     if risk <= 0:
         return None
-    rr_tp2 = abs(tp2 - entry) / risk
-    if rr_tp2 < 1.6:
-        return None
-
-    # HTF tetap wajib searah (ini penting, tidak saya longgarkan)
-    htf_ctx = get_htf_context(symbol)
-    if side == "long":
-        htf_alignment = bool(htf_ctx.get("htf_ok_long", True))
-    else:
-        htf_alignment = bool(htf_ctx.get("htf_ok_short", True))
-
-    if not htf_alignment:
+    rr_tp2 = sign * (tp2 - entry) / risk
+    if rr_tp2 < imb_settings.min_rr_tp2_cut:
         return None
 
-    # Entry tidak boleh terlalu jauh dari harga sekarang (>0.8% sekarang)
-    distance_pct = abs((entry - last_price) / last_price) * 100 if last_price else 999
-    if distance_pct > 0.80:
-        return None
+    # 5) Deteksi liquidity sweep (tidak wajib, jadi faktor kualitas saja).
+    #    Hanya untuk scoring → dihitung setelah semua hard filter lolos.
+    sweep_ok = detect_liquidity_sweep(opens, highs, lows, closes, side, imp_idx)
 
     # ---------- META & SCORING ----------
 
@@ -389,56 +388,42 @@ def analyze_symbol_imb(symbol: str, candles_5m: List[Candle]) -> Optional[Dict]:
         "touch_ok": has_fvg,
         "reaction_ok": bos_ok,
         "liquidity_sweep": sweep_ok,
-        "rr_ok": rr_tp2 >= 1.6,
+        "rr_ok": True,  # rr_tp2 < min_rr_tp2_cut sudah di-return di atas
         "sl_pct": sl_pct,
         "htf_alignment": htf_alignment,
     }
 
-    q = evaluate_signal_quality(meta)
-    if not q["should_send"]:
+    should_send, tier, score = evaluate_signal_quality_fast(meta)
+    if not should_send:
         return None
 
-    tier = q["tier"]
-    score = q["score"]
-
-    direction_label = "LONG" if side == "long" else "SHORT"
-    emoji = "🟢" if side == "long" else "🔴"
-
-    lev_min = levels["lev_min"]
-    lev_max = levels["lev_max"]
-    lev_text = f"{lev_min:.0f}x–{lev_max:.0f}x"
-    sl_pct_text = f"{sl_pct:.2f}%"
-
-    max_age_candles = imb_settings.max_entry_age_candles
-    approx_minutes = max_age_candles * 5
+    approx_minutes = imb_settings.max_entry_age_candles * 5
     valid_text = f"±{approx_minutes} menit" if approx_minutes > 0 else "singkat"
 
-    # Risk calculator mini
-    if sl_pct > 0:
-        pos_mult = 100.0 / sl_pct
-        example_balance = 100.0
-        example_pos = pos_mult * example_balance
-        risk_calc = (
-            f"Risk Calc (contoh risiko 1%):\n"
-            f"• SL : {sl_pct_text} → nilai posisi ≈ (1% / SL%) × balance ≈ {pos_mult:.1f}× balance\n"
-            f"• Contoh balance 100 USDT → posisi ≈ {example_pos:.0f} USDT\n"
-            f"(sesuaikan dengan balance & leverage kamu)"
-        )
-    else:
-        risk_calc = "Risk Calc: SL% tidak valid (0), abaikan kalkulasi ini."
-
-    text = (
-        f"{emoji} IMB SIGNAL — {symbol.upper()} ({direction_label})\n"
-        f"Entry : `{entry:.6f}`\n"
-        f"SL    : `{sl:.6f}`\n"
-        f"TP1   : `{tp1:.6f}`\n"
-        f"TP2   : `{tp2:.6f}`\n"
-        f"TP3   : `{tp3:.6f}`\n"
-        f"Model : IMB Mitigation Block (Semi-Strict)\n"
-        f"Rekomendasi Leverage : {lev_text} (SL {sl_pct_text})\n"
-        f"Validitas Entry : {valid_text}\n"
-        f"Tier : {tier} (Score {score})\n"
-        f"{risk_calc}"
+    # Risk calculator mini (sl_pct pasti > 0: sudah difilter di atas)
+    pos_mult = 100.0 / sl_pct
+    risk_calc = _RISK_CALC(
+        sl_pct=sl_pct,
+        pos_mult=pos_mult,
+        example_pos=pos_mult * 100.0,  # contoh balance 100 USDT
+    )
+
+    text = _SIGNAL_MESSAGE(
+        emoji="🟢" if side == "long" else "🔴",
+        symbol=symbol.upper(),
+        direction="LONG" if side == "long" else "SHORT",
+        entry=entry,
+        sl=sl,
+        tp1=tp1,
+        tp2=tp2,
+        tp3=tp3,
+        lev_min=lev_min,
+        lev_max=lev_max,
+        sl_pct=sl_pct,
+        valid_text=valid_text,
+        tier=tier,
+        score=score,
+        risk_calc=risk_calc,
     )
 
     return {
@@ -0,0 +1,195 @@
+# imb/imb_kernels.py
+# Kernel numerik detektor IMB (Numba @njit, opsional).
+# Semua kernel hanya menerima array float64 + skalar dan mengembalikan
+# int/float, supaya bisa dikompilasi nopython. Tanpa numba tetap jalan
+# sebagai Python biasa (lihat core/numba_compat.py).
+
+from typing import Tuple
+
+import numpy as np
+
+from core.numba_compat import njit, prange
+
+
+@njit("int64(float64[:], float64[:], float64, int64, float64)", cache=True)
+def find_impulse_nb(
+    opens: np.ndarray,
+    closes: np.ndarray,
+    avg_body: float,
+    lookback_tail: int,
+    factor: float,
+) -> int:
+    """
+    Cari candle impuls di `lookback_tail` candle terakhir:
+    body >= factor * avg_body, ambil body terbesar (paling awal kalau seri).
+    Return index impuls, atau -1 kalau tidak ada.
+    """
+    n = opens.size
+    if n < 20 or avg_body <= 0:
+        return -1
+
+    thresh = factor * avg_body
+    best_idx = -1
+    best_body = 0.0
+
+    for i in range(max(0, n - lookback_tail), n):
+        body = abs(closes[i] - opens[i])
+        if body >= thresh and (best_idx < 0 or body > best_body):
+            best_idx = i
+            best_body = body
+
+    return best_idx
+
+
+@njit(
+    "void(float64[:, :], float64[:, :], float64[:], float64, int64[:])",
+    parallel=True,
+    cache=True,
+)
+def find_impulse_batch_nb(
+    opens_2d: np.ndarray,
+    closes_2d: np.ndarray,
+    avg_bodies: np.ndarray,
+    factor: float,
+    out_idx: np.ndarray,
+) -> None:
+    """
+    find_impulse_nb untuk banyak symbol sekaligus (satu baris = satu symbol,
+    kolom = candle ekor). Baris diproses paralel (prange).
+    out_idx[s] = index impuls relatif ke ekor, atau -1.
+    """
+    n_rows, width = opens_2d.shape
+    for s in prange(n_rows):
+        out_idx[s] = find_impulse_nb(
+            opens_2d[s], closes_2d[s], avg_bodies[s], width, factor
+        )
+
+
+@njit(
+    "Tuple((float64, float64, int64, boolean, boolean))"
+    "(float64[:], float64[:], float64[:], float64[:], int64, float64)",
+    cache=True,
+)
+def find_block_nb(
+    opens: np.ndarray,
+    highs: np.ndarray,
+    lows: np.ndarray,
+    closes: np.ndarray,
+    imp_idx: int,
+    avg_body: float,
+) -> Tuple[float, float, int, bool, bool]:
+    """
+    Blok IMB = 1–3 candle warna berlawanan sebelum impuls (body >= 0.5 * avg_body),
+    plus flag kualitas FVG & BOS.
+    Return: (block_low, block_high, side_code, has_fvg, bos_ok)
+    side_code: 1 = long, -1 = short, 0 = tidak ada blok valid.
+    """
+    if imp_idx <= 0:
+        return np.nan, np.nan, 0, False, False
+
+    imp_close = closes[imp_idx]
+    side = 1 if imp_close > opens[imp_idx] else -1
+
+    # ---- cari blok: 1–3 candle sebelum impuls, warna berlawanan & body lumayan ----
+    start = max(0, imp_idx - 3)
+    min_block_body = 0.5 * avg_body
+
+    found = False
+    block_high = -np.inf
+    block_low = np.inf
+    for i in range(start, imp_idx):
+        o = opens[i]
+        c = closes[i]
+        if abs(c - o) < min_block_body:
+            continue
+        # long butuh candle merah, short butuh candle hijau
+        if (side == 1 and c < o) or (side == -1 and c > o):
+            found = True
+            if highs[i] > block_high:
+                block_high = highs[i]
+            if lows[i] < block_low:
+                block_low = lows[i]
+
+    if not found or block_high <= block_low:
+        return np.nan, np.nan, 0, False, False
+
+    # ---- flag FVG ----
+    imp_high = highs[imp_idx]
+    imp_low = lows[imp_idx]
+    if side == 1:
+        has_fvg = imp_low > block_high
+    else:
+        has_fvg = imp_high < block_low
+
+    # ---- flag BOS: tembus struktur 10 candle sebelum blok ----
+    pre_start = max(0, start - 10)
+    bos_ok = False
+    if start > pre_start:
+        if side == 1:
+            prev_struct_high = highs[pre_start:start].max()
+            bos_ok = imp_high > prev_struct_high * 1.0005 or imp_close > prev_struct_high * 1.0005
+        else:
+            prev_struct_low = lows[pre_start:start].min()
+            bos_ok = imp_low < prev_struct_low * 0.9995 or imp_close < prev_struct_low * 0.9995
+
+    return block_low, block_high, side, has_fvg, bos_ok
+
+
+@njit(
+    "boolean(float64[:], float64[:], float64[:], float64[:], int64, int64, int64, float64, float64)",
+    cache=True,
+)
+def detect_sweep_nb(
+    opens: np.ndarray,
+    highs: np.ndarray,
+    lows: np.ndarray,
+    closes: np.ndarray,
+    side: int,
+    impulse_index: int,
+    max_lookback: int,
+    wick_factor: float,
+    range_factor: float,
+) -> bool:
+    """
+    Liquidity sweep dalam `max_lookback` candle sebelum impuls
+    (lihat imb/liquidity_sweep.py untuk kriterianya).
+    side: 1 = long (sweep low), -1 = short (sweep high).
+    """
+    n = closes.size
+    if impulse_index <= 2 or n < 10:
+        return False
+
+    start = max(0, impulse_index - max_lookback)
+
+    # rata-rata range 5 candle sebelum window sweep
+    prev_start = max(0, start - 5)
+    if start <= prev_start:
+        return False
+    range_sum = 0.0
+    for i in range(prev_start, start):
+        range_sum += highs[i] - lows[i]
+    min_range = range_factor * (range_sum / (start - prev_start))
+
+    # dari candle terdekat ke impuls mundur ke `start`
+    for i in range(impulse_index - 1, start - 1, -1):
+        high = highs[i]
+        low = lows[i]
+        close = closes[i]
+
+        total_range = high - low
+        if total_range <= 0 or total_range < min_range:
+            continue
+
+        upper_wick = high - max(opens[i], close)
+        lower_wick = min(opens[i], close) - low
+
+        if side == 1:
+            # low "menusuk" lalu close kembali naik, wick bawah dominan
+            if close > low and lower_wick > 0 and lower_wick >= wick_factor * (upper_wick + 1e-9):
+                return True
+        else:
+            # high "menusuk" lalu close kembali turun, wick atas dominan
+            if close < high and upper_wick > 0 and upper_wick >= wick_factor * (lower_wick + 1e-9):
+                return True
+
+    return False
@@ -1,9 +1,20 @@
 # imb/imb_tiers.py
 # Evaluasi kualitas sinyal IMB dan tentukan Tier (A+, A, B, NONE).
 
-from typing import Dict
+from typing import Dict, Tuple
 
-from core.bot_state import state
+from core.bot_state import TIER_ORDER, state
+
+
+# Bobot skor per flag kualitas, urutan = bit di mask score_signal:
+# has_block, impulse_ok, touch_ok, reaction_ok, rr_ok, htf_alignment
+_SCORE_WEIGHTS = (25, 25, 15, 15, 10, 20)
+
+# Total bobot untuk tiap kombinasi flag (index = bitmask), dihitung sekali saat import
+_SCORE_LUT = tuple(
+    sum(w for bit, w in enumerate(_SCORE_WEIGHTS) if mask >> bit & 1)
+    for mask in range(1 << len(_SCORE_WEIGHTS))
+)
 
 
 def score_signal(meta: Dict) -> int:
@@ -16,71 +27,44 @@ def score_signal(meta: Dict) -> int:
     - RR sehat
     - SL% sehat
     - align dengan konteks HTF
+    Flag boolean dipadatkan jadi bitmask → satu lookup _SCORE_LUT.
     """
-
-    score = 0
-
-    has_block = bool(meta.get("has_block"))
-    impulse_ok = bool(meta.get("impulse_ok"))
-    touch_ok = bool(meta.get("touch_ok"))
-    reaction_ok = bool(meta.get("reaction_ok"))
-    rr_ok = bool(meta.get("rr_ok"))
-    htf_alignment = bool(meta.get("htf_alignment"))
-
-    sl_pct = float(meta.get("sl_pct", 0.0))
-
-    if has_block:
-        score += 25
-    if impulse_ok:
-        score += 25
-    if touch_ok:
-        score += 15
-    if reaction_ok:
-        score += 15
-    if rr_ok:
-        score += 10
+    mask = (
+        bool(meta.get("has_block"))
+        | bool(meta.get("impulse_ok")) << 1
+        | bool(meta.get("touch_ok")) << 2
+        | bool(meta.get("reaction_ok")) << 3
+        | bool(meta.get("rr_ok")) << 4
+        | bool(meta.get("htf_alignment")) << 5
+    )
+    score = _SCORE_LUT[mask]
 
     # SL% sehat (kecil tapi tidak ekstrem)
+    sl_pct = float(meta.get("sl_pct", 0.0))
     if 0.20 <= sl_pct <= 0.90:
         score += 10
 
-    if htf_alignment:
-        score += 20
-
-    return int(min(score, 150))
+    return min(score, 150)
 
 
-def tier_from_score(score: int) -> str:
-    """
-    Tier:
-    - A+ : >= 120
-    - A  : 100–119
-    - B  : 80–99
-    - NONE : < 80
-    """
-    if score >= 120:
-        return "A+"
-    elif score >= 100:
-        return "A"
-    elif score >= 80:
-        return "B"
-    else:
-        return "NONE"
-
+# Tier per skor 0..150, dihitung sekali:
+# A+ >= 120, A 100–119, B 80–99, NONE < 80
+_MAX_SCORE = 150
+_TIER_BY_SCORE = tuple(
+    "A+" if sc >= 120 else "A" if sc >= 100 else "B" if sc >= 80 else "NONE"
+    for sc in range(_MAX_SCORE + 1)
+)
 
-def should_send_tier(tier: str) -> bool:
-    """
-    Urutan: NONE < B < A < A+
-    Bandingkan terhadap state.min_tier (diatur via Telegram /mode).
-    """
-    order = {"NONE": 0, "B": 1, "A": 2, "A+": 3}
-    min_tier = state.min_tier or "A"
-    return order.get(tier, 0) >= order.get(min_tier, 2)
+# Rank tier (TIER_ORDER) per skor, untuk gate tier tanpa lookup string
+_TIER_RANK_BY_SCORE = tuple(TIER_ORDER[t] for t in _TIER_BY_SCORE)
 
 
-def evaluate_signal_quality(meta: Dict) -> Dict:
+def evaluate_signal_quality_fast(meta: Dict) -> Tuple[bool, str, int]:
     """
-    Wrapper untuk dipanggil dari analyzer.
+    Evaluasi kualitas sinyal untuk analyzer.
+    Return (should_send, tier, score). Urutan tier NONE < B < A < A+;
+    gate tier pakai rank per skor vs state.min_tier_rank
+    (min_tier diatur via Telegram /mode).
 
     meta minimal berisi:
     {
@@ -94,10 +78,5 @@ def evaluate_signal_quality(meta: Dict) -> Dict:
     }
     """
     score = score_signal(meta)
-    tier = tier_from_score(score)
-    send = should_send_tier(tier)
-    return {
-        "score": score,
-        "tier": tier,
-        "should_send": send,
-    }
+    idx = min(max(score, 0), _MAX_SCORE)
+    return _TIER_RANK_BY_SCORE[idx] >= state.min_tier_rank, _TIER_BY_SCORE[idx], score
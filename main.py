@@ -2,14 +2,34 @@
 # Entry point: start Telegram command loop + Binance IMB stream loop.
 
 import asyncio
+import logging
+import sys
 import threading
 
+try:
+    # event loop berbasis libuv, lebih ringan untuk banyak frame WebSocket kecil
+    import uvloop
+except ImportError:
+    uvloop = None
+
 from core.bot_state import state
 from telegram.telegram_core import telegram_command_loop
 from binance.binance_stream import run_imb_bot
 
 
 if __name__ == "__main__":
+    # stdout, sama dengan print() modul lain → satu stream, urutan log terjaga
+    logging.basicConfig(
+        stream=sys.stdout,
+        level=logging.INFO,
+        format="[%(asctime)s] %(message)s",
+        datefmt="%H:%M:%S",
+    )
+
+    if uvloop is not None:
+        uvloop.install()
+        logging.info("uvloop aktif.")
+
     # Jalankan loop command Telegram di thread terpisah
     cmd_thread = threading.Thread(target=telegram_command_loop, daemon=True)
     cmd_thread.start()
@@ -10,6 +10,8 @@ from core.bot_state import (
     save_bot_state,
     save_subscribers,
     save_vip_users,
+    set_debug,
+    set_min_tier,
 )
 from telegram.telegram_common import send_telegram, hard_restart
 from telegram.telegram_keyboards import get_user_reply_keyboard, get_admin_reply_keyboard
@@ -169,11 +171,11 @@ def handle_command(cmd: str, args: list, chat_id: int) -> None:
             return
         mode = args[0].lower()
         if mode == "aplus":
-            state.min_tier = "A+"
+            set_min_tier("A+")
         elif mode == "a":
-            state.min_tier = "A"
+            set_min_tier("A")
         elif mode == "b":
-            state.min_tier = "B"
+            set_min_tier("B")
         else:
             send_telegram("Mode tidak dikenali. Gunakan: aplus | a | b", chat_id)
             return
@@ -300,10 +302,10 @@ def handle_command(cmd: str, args: list, chat_id: int) -> None:
             return
         val = args[0].lower()
         if val == "on":
-            state.debug = True
+            set_debug(True)
             send_telegram("Debug *ON*.", chat_id)
         elif val == "off":
-            state.debug = False
+            set_debug(False)
             send_telegram("Debug *OFF*.", chat_id)
         else:
             send_telegram("Gunakan: /debug on | off", chat_id)